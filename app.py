@@ -1,17 +1,43 @@
 import os
+import re
 import json
-from math import ceil
+import queue
+import atexit
+import sqlite3
+import gzip
+import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime, date, timedelta
+import click
 from flask import Flask, render_template, request, redirect, url_for, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from markupsafe import Markup
+from jinja2.utils import htmlsafe_json_dumps
+
+import gallery_thumbs
+from mtbi_series import downsample
+from mtbi_store import MtbiStore
+from priority_rules import get_rules
+from voc_dedup import LshIndex, minhash, to_blob, from_blob
+from sqlalchemy import event, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # 기본 경로 설정
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 GALLERY_DIR = os.path.join(STATIC_DIR, "gallery", "events")
+THUMB_DIR = os.path.join(STATIC_DIR, "gallery", "thumbs")  # gallery_thumbs.py 축소본 (자동 생성)
 BIRTHDAYS_JSON = os.path.join(DATA_DIR, "birthdays.json")
 MTBI_JSON = os.path.join(DATA_DIR, "mtbi.json")
+MTBI_DB = os.path.join(DATA_DIR, "mtbi.sqlite3")  # mtbi_batch.py 저장소 (있으면 JSON보다 우선)
+PRIORITY_KEYWORDS_JSON = os.path.join(DATA_DIR, "priority_keywords.json")  # VOC 우선순위 사전
 
 # 필요한 폴더 자동 생성
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -20,11 +46,54 @@ os.makedirs(GALLERY_DIR, exist_ok=True)
 app = Flask(__name__)
 
 # SQLite DB 설정
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dept_portal.sqlite3'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DEPT_PORTAL_DB_URI", 'sqlite:///dept_portal.sqlite3')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 연결 풀 (요청 스레드별 읽기 연결, WAL이라 읽기는 쓰기를 기다리지 않음)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.environ.get("DB_POOL_OVERFLOW", "10")),
+}
+# 다른 프로세스가 쓰는 중일 때 잠금 대기 시간(ms)
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+# 쓰기 큐: 1이면 VOC 등록/좋아요/전달사항 등록을 쓰기 전용 스레드 하나가 순서대로 처리
+app.config['DB_WRITER_QUEUE'] = os.environ.get("DB_WRITER_QUEUE", "1") == "1"
+app.config['DB_WRITER_BATCH'] = int(os.environ.get("DB_WRITER_BATCH", "64"))  # 한 트랜잭션 최대 작업 수
+# 요청이 쓰기 큐 결과를 기다리는 최대 시간(초), 넘으면 아직 시작 안 한 작업은 취소
+app.config['DB_WRITE_TIMEOUT_SEC'] = float(os.environ.get("DB_WRITE_TIMEOUT_SEC", "30"))
+# 좋아요 write-behind 주기(ms). 0이면 클릭마다 즉시 반영
+app.config['GALLERY_LIKE_FLUSH_MS'] = int(os.environ.get("GALLERY_LIKE_FLUSH_MS", "0"))
+# VOC 요약 백그라운드 작업 스레드 수. 0이면 등록 요청에서 바로 요약(기존 방식)
+app.config['VOC_SUMMARY_WORKERS'] = int(os.environ.get("VOC_SUMMARY_WORKERS", "2"))
+# 메인 화면 위젯 조각 캐시: 최대 항목 수, 최대 보관 시간(초, 다른 프로세스의 좋아요 반영 주기)
+app.config['HOME_FRAGMENT_CACHE_SIZE'] = int(os.environ.get("HOME_FRAGMENT_CACHE_SIZE", "32"))
+app.config['HOME_FRAGMENT_TTL_SEC'] = int(os.environ.get("HOME_FRAGMENT_TTL_SEC", "60"))
+# 행사 사진 썸네일 생성 프로세스 수 (Pillow 필요, 없으면 원본 표시)
+app.config['GALLERY_THUMB_WORKERS'] = int(os.environ.get("GALLERY_THUMB_WORKERS", "2"))
 db = SQLAlchemy(app)
 
 
+# ====================== DB 연결 설정 ======================
+
+# 연결마다 적용 (journal_mode=WAL은 DB 파일에 남지만 매번 확인해도 비용 없음)
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # 읽기와 쓰기 동시 진행
+    "PRAGMA synchronous=NORMAL",    # WAL에서는 체크포인트 때만 fsync (전원 장애 시 마지막 커밋만 유실 가능)
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",     # 연결당 16MB
+)
+
+
+@event.listens_for(Engine, "connect")
+def sqlite_on_connect(dbapi_conn, _record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    for pragma in SQLITE_PRAGMAS:
+        cur.execute(pragma)
+    cur.close()
+
+
 # ====================== DB 모델 ======================
 
 class VOC(db.Model):
@@ -34,7 +103,26 @@ class VOC(db.Model):
     content = db.Column(db.Text, nullable=False)
     summary = db.Column(db.Text, nullable=False)
     priority = db.Column(db.String(20), nullable=False, default="중")
+    # 정렬용 우선순위 값(상=2, 중=1, 하=0) — priority와 함께 저장
+    priority_rank = db.Column(db.Integer, nullable=False, default=1)
+    # 요약 상태: pending(작업 대기) → done | failed
+    status = db.Column(db.String(20), nullable=False, default="done")
+    # 유사 중복이면 묶음 원본 VOC id (원본은 NULL)
+    dup_of = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    # 마지막 변경 시각 (요약 완료·재분류·중복 묶음 변경) — VOC 화면 ETag용
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        # VOC 목록: 원본(dup_of IS NULL)만 우선순위 → 최신순 keyset 페이지네이션
+        # 원본/중복을 부분 인덱스로 나눔 — 한 인덱스에 섞으면 NULL이 대부분이라
+        # ANALYZE 통계상 dup_of 조건이 쓸모없어 보여 목록은 임시 B-tree 정렬, 중복 조회는 전체 스캔이 됨
+        db.Index("ix_voc_board_roots", "priority_rank", "created_at", "id",
+                 sqlite_where=text("dup_of IS NULL")),
+        # 원본별 중복 조회(dup_of = ?, IN)
+        db.Index("ix_voc_dups", "dup_of", sqlite_where=text("dup_of IS NOT NULL")),
+        db.Index("ix_voc_updated", "updated_at"),
+    )
 
 
 class GalleryImage(db.Model):
@@ -50,38 +138,435 @@ class Announcement(db.Model):
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # 전달사항 목록: 최신순 keyset 페이지네이션
+        db.Index("ix_announcement_created", "created_at", "id"),
+    )
+
+
+class VocSignature(db.Model):
+    """VOC 본문 MinHash 서명 (voc_dedup, uint32 little-endian 배열)"""
+    voc_id = db.Column(db.Integer, primary_key=True)
+    sig = db.Column(db.LargeBinary, nullable=False)
+
+
+class VocJob(db.Model):
+    """VOC 요약 작업 큐 (성공하면 삭제, 재시도 초과 시 failed로 남김)"""
+    id = db.Column(db.Integer, primary_key=True)
+    voc_id = db.Column(db.Integer, nullable=False, unique=True)
+    state = db.Column(db.String(20), nullable=False, default="queued")  # queued | running | failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index("ix_voc_job_claim", "state", "next_run_at", "id"),
+    )
+
+
+# ====================== DB 스키마 보정 ======================
+
+# create_all()은 기존 테이블을 변경하지 않으므로, 추가된 컬럼은 여기서 반영
+SCHEMA_COLUMNS = {
+    "voc": [
+        ("priority_rank", "INTEGER NOT NULL DEFAULT 1",
+         "UPDATE voc SET priority_rank = CASE priority "
+         "WHEN '상' THEN 2 WHEN '중' THEN 1 ELSE 0 END"),
+        ("status", "VARCHAR(20) NOT NULL DEFAULT 'done'", None),
+        ("dup_of", "INTEGER", None),
+        ("updated_at", "DATETIME", "UPDATE voc SET updated_at = created_at"),
+    ],
+}
+
+# 다른 인덱스로 대체되어 기존 DB에서 지울 인덱스
+SCHEMA_DROPPED_INDEXES = [
+    "ix_voc_board",   # → ix_voc_board_roots (dup_of IS NULL 부분 인덱스)
+    "ix_voc_dup_of",  # → ix_voc_dups (dup_of IS NOT NULL 부분 인덱스)
+]
+
+
+def ensure_schema():
+    """테이블 생성 + 누락 컬럼 추가(기존 데이터 보정) + 인덱스 생성"""
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    for table, columns in SCHEMA_COLUMNS.items():
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        for name, ddl, backfill in columns:
+            if name in existing:
+                continue
+            try:
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+            except OperationalError as e:
+                # 여러 워커가 동시에 시작하면 다른 프로세스가 먼저 추가했을 수 있음
+                if "duplicate column" not in str(e):
+                    raise
+                db.session.rollback()
+                continue
+            if backfill:
+                db.session.execute(text(backfill))
+            db.session.commit()
+    db.session.execute(text(VOC_FTS_DDL))
+    for name in SCHEMA_DROPPED_INDEXES:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.commit()
+    for model in (VOC, GalleryImage, Announcement, VocSignature, VocJob):
+        for index in model.__table__.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except OperationalError as e:
+                if "already exists" not in str(e):
+                    raise
+
+
+# ====================== 유틸: DB 쓰기 큐 ======================
+
+class DbWriteCancelled(Exception):
+    """쓰기 큐에서 기다리다 시간 초과, 시작 전에 취소됨 — 반영되지 않았으므로 다시 시도해도 안전"""
+
+
+class DbWriteTimeout(TimeoutError):
+    """쓰기 큐에서 기다리다 시간 초과, 이미 실행 중 — 반영 여부는 future로 확인"""
+
+    def __init__(self, msg: str, future: Future):
+        super().__init__(msg)
+        self.future = future
+
+
+class DbWriter:
+    """
+    쓰기 전용 스레드 1개 + 큐: 요청 스레드들의 쓰기를 순서대로 실행
+    - 프로세스 안에서는 쓰기끼리 SQLite 잠금을 다투지 않는다 (다른 프로세스와는 busy_timeout으로 대기)
+    - 쌓여 있는 작업은 최대 batch개를 한 트랜잭션으로 묶어 commit (몰릴수록 커밋 1회당 처리량 증가)
+    - 묶음 중 하나가 실패하면 롤백 후 하나씩 다시 실행 → 실패한 작업만 예외를 돌려받음
+    - 작업 함수는 commit하지 않고, ORM 객체 대신 id 같은 단순 값을 돌려준다
+    - 롤백 실패 등 예상 밖 예외는 그 묶음의 미완료 작업에 돌려주고 스레드는 계속 동작,
+      그래도 스레드가 죽으면 get_db_writer()가 같은 큐로 다시 시작
+    """
+
+    def __init__(self, flask_app, batch: int):
+        self.app = flask_app
+        self.batch = max(1, batch)
+        self._queue = queue.Queue()
+        self.start()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        fut = Future()
+        self._queue.put((fn, args, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            tasks = [self._queue.get()]
+            while len(tasks) < self.batch:
+                try:
+                    tasks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 기다리다 포기(취소)한 작업은 실행하지 않음, 나머지는 실행 중 상태라 더는 취소되지 않음
+            tasks = [t for t in tasks if t[2].set_running_or_notify_cancel()]
+            if not tasks:
+                continue
+            try:
+                with self.app.app_context():
+                    self._execute(tasks)
+            except BaseException as e:
+                # 실행 중 상태의 작업은 반드시 끝내 둔다 (결과를 기다리는 쪽이 영원히 멈추지 않도록)
+                self.app.logger.exception("DB 쓰기 큐 처리 실패 (대기 중인 작업에 오류 전달)")
+                err = e if isinstance(e, Exception) else RuntimeError(f"DB 쓰기 스레드 중단: {e!r}")
+                for _, _, fut in tasks:
+                    if not fut.done():
+                        fut.set_exception(err)
+                if not isinstance(e, Exception):
+                    raise
+
+    def _execute(self, tasks):
+        try:
+            results = [fn(*args) for fn, args, _ in tasks]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(tasks) == 1:
+                tasks[0][2].set_exception(e)
+            else:
+                for task in tasks:
+                    self._execute([task])
+            return
+        for (_, _, fut), result in zip(tasks, results):
+            fut.set_result(result)
+
+
+_db_writer = None
+_db_writer_lock = threading.Lock()
+
+
+def get_db_writer():
+    """DB_WRITER_QUEUE가 켜져 있을 때만 쓰기 스레드 사용 (최초 호출 시 생성)"""
+    global _db_writer
+    if not app.config.get("DB_WRITER_QUEUE"):
+        return None
+    if _db_writer is None or not _db_writer.thread.is_alive():
+        with _db_writer_lock:
+            if _db_writer is None:
+                _db_writer = DbWriter(app, app.config["DB_WRITER_BATCH"])
+            elif not _db_writer.thread.is_alive():
+                app.logger.error("DB 쓰기 스레드가 중단되어 다시 시작")
+                _db_writer.start()
+    return _db_writer
+
+
+def db_write(fn, *args):
+    """
+    쓰기 작업 fn(*args)을 실행·commit 후 결과 반환 (쓰기 큐가 있으면 큐에서)
+    - 큐에서는 DB_WRITE_TIMEOUT_SEC까지만 기다림, 넘으면
+      · 아직 시작 안 한 작업: 취소 → DbWriteCancelled (반영 안 됨)
+      · 이미 실행 중인 작업: DbWriteTimeout (끝나면 반영될 수 있음, e.future로 결과 확인)
+    """
+    writer = get_db_writer()
+    if writer is not None and threading.current_thread() is not writer.thread:
+        fut = writer.submit(fn, *args)
+        timeout = app.config["DB_WRITE_TIMEOUT_SEC"]
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeoutError:
+            if fut.cancel():
+                raise DbWriteCancelled(f"쓰기 대기 {timeout:g}초 초과 (취소됨)") from None
+            raise DbWriteTimeout(f"쓰기 대기 {timeout:g}초 초과 (실행 중)", fut) from None
+    try:
+        result = fn(*args)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
 
 # ====================== 유틸: 행사 사진 ======================
 
 ALLOWED_EXT = {".jpg", ".jpeg", ".png", ".gif"}
 
 
-def list_event_images():
-    """행사 사진 목록 (수정시간 기준 최신순)"""
+def scan_event_images():
+    """행사 사진 폴더 스캔 (수정시간 기준 최신순)"""
     files = []
     if not os.path.isdir(GALLERY_DIR):
         return files
-    for name in os.listdir(GALLERY_DIR):
-        ext = os.path.splitext(name)[1].lower()
-        if ext in ALLOWED_EXT:
-            full = os.path.join(GALLERY_DIR, name)
-            mtime = os.path.getmtime(full)
-            files.append({
-                "name": name,
-                "src": f"gallery/events/{name}",
-                "mtime": mtime,
-            })
+    with os.scandir(GALLERY_DIR) as it:
+        for entry in it:
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext in ALLOWED_EXT and entry.is_file():
+                st = entry.stat()
+                files.append({
+                    "name": entry.name,
+                    "src": f"gallery/events/{entry.name}",
+                    "mtime": st.st_mtime,
+                    "mtime_ns": st.st_mtime_ns,  # 썸네일 키
+                })
     files.sort(key=lambda x: x["mtime"], reverse=True)
     return files
 
 
-def get_or_create_image_row(filename: str) -> GalleryImage:
-    row = GalleryImage.query.filter_by(filename=filename).first()
-    if row is None:
-        row = GalleryImage(filename=filename, likes=0)
-        db.session.add(row)
-        db.session.commit()
-    return row
+# 폴더 mtime이 바뀔 때(추가/삭제/이름변경)만 다시 스캔
+_gallery_index = {"dir_mtime": None, "files": [], "names": frozenset()}
+_gallery_lock = threading.Lock()
+
+
+def gallery_index():
+    """캐시된 행사 사진 인덱스 (폴더 stat 1회)"""
+    try:
+        dir_mtime = os.stat(GALLERY_DIR).st_mtime_ns
+    except OSError:
+        dir_mtime = None
+    if _gallery_index["dir_mtime"] != dir_mtime:
+        with _gallery_lock:
+            if _gallery_index["dir_mtime"] != dir_mtime:
+                files = scan_event_images() if dir_mtime is not None else []
+                _gallery_index.update(
+                    dir_mtime=dir_mtime,
+                    files=files,
+                    names=frozenset(f["name"] for f in files),
+                )
+    return _gallery_index
+
+
+def list_event_images():
+    """행사 사진 목록 (수정시간 기준 최신순)"""
+    return gallery_index()["files"]
+
+
+# 썸네일이 새로 준비되면 메인 화면 갤러리 조각을 다시 렌더링
+gallery_thumbnails = gallery_thumbs.ThumbnailPipeline(
+    GALLERY_DIR, THUMB_DIR, app.config["GALLERY_THUMB_WORKERS"],
+    on_ready=lambda: home_fragments.invalidate("gallery"),
+)
+
+
+def thumb_srcsets(files) -> dict:
+    """파일명 -> {"src": 작은 썸네일 URL, "srcset": "URL 320w, URL 640w"} (준비된 것만)"""
+    gallery_thumbnails.ensure(files)  # 없는 것은 백그라운드 생성, 이번 응답은 원본
+    out = {}
+    for it in files:
+        variants = gallery_thumbnails.variants(it["name"], it["mtime_ns"])
+        if variants:
+            urls = [(w, url_for("static", filename=f"gallery/thumbs/{f}")) for w, f in variants]
+            out[it["name"]] = {
+                "src": urls[0][1],
+                "srcset": ", ".join(f"{u} {w}w" for w, u in urls),
+            }
+    return out
+
+
+def get_likes_map(names) -> dict:
+    """파일명 목록 -> 좋아요 수 (IN 쿼리 1회)"""
+    likes = dict.fromkeys(names, 0)
+    if likes:
+        rows = (
+            GalleryImage.query
+            .with_entities(GalleryImage.filename, GalleryImage.likes)
+            .filter(GalleryImage.filename.in_(list(likes)))
+            .all()
+        )
+        likes.update(rows)
+    return likes
+
+
+def increment_likes(counts: dict) -> dict:
+    """
+    {파일명: 증가량}을 한 트랜잭션에서 upsert + 증가(원자적)
+    - 행이 없으면 생성, 있으면 likes = likes + n (읽고-쓰기 경합 없음)
+    - 반영 후 좋아요 수를 돌려준다
+    """
+    return db_write(apply_likes, counts)
+
+
+def apply_likes(counts: dict) -> dict:
+    """increment_likes 본체 (쓰기 큐에서 실행, commit은 호출부)"""
+    out = {}
+    for filename, n in counts.items():
+        stmt = (
+            sqlite_insert(GalleryImage)
+            .values(filename=filename, likes=n, created_at=datetime.now())
+            .on_conflict_do_update(
+                index_elements=[GalleryImage.filename],
+                set_={"likes": GalleryImage.likes + n},
+            )
+            .returning(GalleryImage.likes)
+        )
+        out[filename] = db.session.execute(stmt).scalar_one()
+    return out
+
+
+class LikeAggregator:
+    """
+    좋아요 write-behind 집계기
+    - 클릭은 메모리에만 누적, flush_ms마다 한 트랜잭션으로 반영
+    - 조회는 DB 값 + 미반영분을 더해 정확한 수를 돌려준다
+    """
+
+    def __init__(self, flask_app, flush_ms: int):
+        self.app = flask_app
+        self.interval = flush_ms / 1000.0
+        self._pending = {}
+        self._lock = threading.Lock()        # _pending 보호
+        self._flush_lock = threading.Lock()  # flush 중 조회가 이중 계산하지 않도록
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="like-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, filename: str, n: int = 1) -> int:
+        with self._lock:
+            self._pending[filename] = self._pending.get(filename, 0) + n
+        return self.counts([filename])[filename]
+
+    def counts(self, names) -> dict:
+        with self._flush_lock:
+            likes = get_likes_map(names)
+            with self._lock:
+                for name in likes:
+                    likes[name] += self._pending.get(name, 0)
+        return likes
+
+    def pending_total(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            with self.app.app_context():
+                try:
+                    try:
+                        increment_likes(batch)
+                    except DbWriteTimeout as e:
+                        # 이미 실행 중인 쓰기는 취소할 수 없음 → 끝날 때까지 기다려 결과 확인
+                        # (다시 넣으면 커밋된 좋아요가 두 번 반영됨)
+                        e.future.result()
+                except Exception:
+                    # 반영되지 않은 배치(실패·롤백, 시작 전 취소)만 다음 주기에 다시 반영
+                    with self._lock:
+                        for name, n in batch.items():
+                            self._pending[name] = self._pending.get(name, 0) + n
+                    raise
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                app.logger.exception("좋아요 flush 실패 (다음 주기에 재시도)")
+
+
+_like_aggregator = None
+_like_aggregator_lock = threading.Lock()
+
+
+def get_like_aggregator():
+    """GALLERY_LIKE_FLUSH_MS > 0일 때만 집계기 사용 (최초 호출 시 생성)"""
+    global _like_aggregator
+    flush_ms = app.config.get("GALLERY_LIKE_FLUSH_MS") or 0
+    if flush_ms <= 0:
+        return None
+    if _like_aggregator is None:
+        with _like_aggregator_lock:
+            if _like_aggregator is None:
+                _like_aggregator = LikeAggregator(app, flush_ms)
+    return _like_aggregator
+
+
+def add_like(filename: str) -> int:
+    """좋아요 1회 반영 후 현재 좋아요 수"""
+    agg = get_like_aggregator()
+    if agg is not None:
+        likes = agg.add(filename)
+    else:
+        likes = increment_likes({filename: 1})[filename]
+    home_fragments.invalidate("gallery")  # 반영 후 제거해야 옛 값이 다시 캐시되지 않음
+    return likes
+
+
+def likes_version() -> int:
+    """전체 좋아요 수 (DB + 미반영분) — 좋아요가 늘면 바뀌는 값, 다른 프로세스의 반영분도 포함"""
+    total = db.session.query(db.func.coalesce(db.func.sum(GalleryImage.likes), 0)).scalar()
+    agg = get_like_aggregator()
+    return total + (agg.pending_total() if agg is not None else 0)
+
+
+def current_likes(names) -> dict:
+    """파일명 목록 -> 좋아요 수 (write-behind 미반영분 포함)"""
+    agg = get_like_aggregator()
+    if agg is not None:
+        return agg.counts(names)
+    return get_likes_map(names)
 
 
 # ====================== 유틸: VOC 요약/우선순위 ======================
@@ -95,18 +580,308 @@ def summarize_with_llm(text: str) -> str:
 
 
 def classify_priority(text: str) -> str:
-    """키워드 기반 우선순위"""
-    keywords_high = ["불량", "라인멈춤", "downtime", "긴급", "고장", "정지", "화재", "안전"]
-    for k in keywords_high:
-        if k in text:
-            return "상"
-    return "중"
+    """가중치 키워드 사전 기반 우선순위 (상/중/하, 매칭 없으면 중) — priority_rules 참고"""
+    return get_rules(PRIORITY_KEYWORDS_JSON).classify(text)
 
 
 def priority_rank(p: str) -> int:
     return {"상": 2, "중": 1, "하": 0}.get(p, 0)
 
 
+# ====================== 유틸: VOC 검색(FTS5) ======================
+
+# 한국어는 띄어쓰기 단위 토큰으로는 부분 검색이 안 되므로, 2글자(bigram) 토큰을
+# 공백으로 이어 저장하고 unicode61로 나눈다. rowid = voc.id
+VOC_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS voc_fts USING fts5("
+    "title, content, summary, tokenize = 'unicode61 remove_diacritics 0')"
+)
+VOC_FTS_WEIGHTS = (3.0, 1.0, 0.5)  # bm25 컬럼 가중치: 제목 > 본문 > 요약(본문 일부)
+VOC_SEARCH_PAGE_SIZE = 20
+VOC_SEARCH_MAX_PAGES = 50   # 관련도순 상위 1,000건까지만 (OFFSET이 커지면 매번 앞쪽을 다시 정렬)
+_FTS_WORD = re.compile(r"[^\W_]+")
+
+
+def ngram_text(s: str) -> str:
+    """'라인 정지됨' -> '라인 정지 지됨' (단어별 bigram, 1글자 단어는 그대로)"""
+    grams = []
+    for w in _FTS_WORD.findall((s or "").lower()):
+        grams.extend(w[i:i + 2] for i in range(max(1, len(w) - 1)))
+    return " ".join(grams)
+
+
+def fts_match_query(q: str) -> str:
+    """
+    검색어 -> FTS5 MATCH 식 (단어마다 bigram 구문, 모든 단어 AND)
+    - 2글자 이상: bigram 연속 구문 → 원문 부분 문자열 일치
+    - 1글자: 해당 글자로 시작하는 토큰 접두 검색
+    """
+    terms = []
+    for w in _FTS_WORD.findall((q or "").lower()):
+        terms.append(f'"{w}"*' if len(w) == 1 else f'"{ngram_text(w)}"')
+    return " AND ".join(terms)
+
+
+def index_voc(voc):
+    """VOC 1건 검색 색인 추가/교체 (호출한 세션 트랜잭션 안에서)"""
+    db.session.execute(text("DELETE FROM voc_fts WHERE rowid = :id"), {"id": voc.id})
+    db.session.execute(
+        text("INSERT INTO voc_fts (rowid, title, content, summary) VALUES (:id, :t, :c, :s)"),
+        {"id": voc.id, "t": ngram_text(voc.title),
+         "c": ngram_text(voc.content), "s": ngram_text(voc.summary)},
+    )
+
+
+def rebuild_voc_fts(batch: int = 500) -> int:
+    """기존 VOC 전체 재색인 (id 순 keyset 배치), 색인 건수 반환"""
+    db.session.execute(text("DELETE FROM voc_fts"))
+    n, last_id = 0, 0
+    while True:
+        rows = (VOC.query.with_entities(VOC.id, VOC.title, VOC.content, VOC.summary)
+                .filter(VOC.id > last_id).order_by(VOC.id).limit(batch).all())
+        if not rows:
+            break
+        db.session.execute(
+            text("INSERT INTO voc_fts (rowid, title, content, summary) VALUES (:id, :t, :c, :s)"),
+            [{"id": r.id, "t": ngram_text(r.title), "c": ngram_text(r.content),
+              "s": ngram_text(r.summary)} for r in rows],
+        )
+        n += len(rows)
+        last_id = rows[-1].id
+    db.session.execute(text("INSERT INTO voc_fts (voc_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return n
+
+
+def search_voc(q: str, page: int):
+    """검색어 -> (해당 페이지 VOC 목록(bm25 순), 다음 페이지 여부), page는 1~VOC_SEARCH_MAX_PAGES"""
+    match = fts_match_query(q)
+    if not match:
+        return [], False
+    ids = [r[0] for r in db.session.execute(
+        text(
+            "SELECT rowid FROM voc_fts WHERE voc_fts MATCH :q "
+            "ORDER BY bm25(voc_fts, {}, {}, {}), rowid DESC LIMIT :lim OFFSET :off"
+            .format(*VOC_FTS_WEIGHTS)
+        ),
+        {"q": match, "lim": VOC_SEARCH_PAGE_SIZE + 1, "off": (page - 1) * VOC_SEARCH_PAGE_SIZE},
+    )]
+    has_next = len(ids) > VOC_SEARCH_PAGE_SIZE and page < VOC_SEARCH_MAX_PAGES
+    ids = ids[:VOC_SEARCH_PAGE_SIZE]
+    rows = {r.id: r for r in VOC.query.with_entities(*VOC_BOARD_COLUMNS).filter(VOC.id.in_(ids))}
+    return [rows[i] for i in ids if i in rows], has_next
+
+
+# ====================== 유틸: VOC 유사 중복 ======================
+
+_dedup_index = LshIndex()
+_dedup_lock = threading.Lock()
+
+
+def dedup_index() -> LshIndex:
+    """메모리 LSH 색인 — 마지막으로 반영한 voc_id 이후 서명만 읽어 증분 반영"""
+    with _dedup_lock:
+        rows = (VocSignature.query
+                .filter(VocSignature.voc_id > _dedup_index.max_id)
+                .order_by(VocSignature.voc_id).all())
+        _dedup_index.add_many((r.voc_id, from_blob(r.sig)) for r in rows)
+    return _dedup_index
+
+
+def find_duplicate(sig, rank: int):
+    """
+    유사 VOC가 있으면 그 묶음의 원본 id, 없으면 None
+    - 원본의 우선순위가 같은 묶음에만 넣는다: 목록에는 원본만 나오므로
+      더 높은 우선순위 VOC가 낮은 원본 아래 숨거나, 비슷한 문구의 다른 건이 묶이지 않도록
+    """
+    matches = dedup_index().matches(sig)
+    if not matches:
+        return None
+    ids = [voc_id for voc_id, _ in matches]
+    roots = {r.id: r.dup_of or r.id
+             for r in VOC.query.with_entities(VOC.id, VOC.dup_of).filter(VOC.id.in_(ids))}
+    root_ranks = dict(VOC.query.with_entities(VOC.id, VOC.priority_rank)
+                      .filter(VOC.id.in_(set(roots.values()))))
+    for voc_id in ids:
+        root = roots.get(voc_id)
+        if root is not None and root_ranks.get(root) == rank:
+            return root
+    return None
+
+
+def duplicate_counts(ids) -> dict:
+    """원본 id 목록 -> {원본 id: 묶인 중복 수}"""
+    if not ids:
+        return {}
+    rows = (db.session.query(VOC.dup_of, db.func.count())
+            .filter(VOC.dup_of.in_(ids)).group_by(VOC.dup_of).all())
+    return dict(rows)
+
+
+def detach_mismatched_duplicates() -> int:
+    """원본과 우선순위가 달라진 중복을 묶음에서 뺀다 (commit은 호출부), 분리 건수 반환"""
+    root = db.aliased(VOC)
+    root_rank = db.select(root.priority_rank).where(root.id == VOC.dup_of).scalar_subquery()
+    return db.session.execute(
+        db.update(VOC)
+        .where(VOC.dup_of.is_not(None), VOC.priority_rank != root_rank)
+        .values(dup_of=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def rebuild_voc_dedup(batch: int = 500) -> int:
+    """서명·중복 묶음 전체 재계산 (id 순이라 먼저 등록된 VOC가 원본), 중복 건수 반환"""
+    global _dedup_index
+    index = LshIndex()
+    db.session.execute(db.delete(VocSignature))
+    roots = {}   # voc_id -> 원본 id (원본이면 None)
+    ranks = {}   # voc_id -> priority_rank
+    n_dup, last_id = 0, 0
+    while True:
+        rows = (VOC.query.with_entities(VOC.id, VOC.content, VOC.priority_rank)
+                .filter(VOC.id > last_id).order_by(VOC.id).limit(batch).all())
+        if not rows:
+            break
+        sigs, updates = [], []
+        for r in rows:
+            sig = minhash(r.content)
+            # find_duplicate와 같은 규칙: 우선순위가 같은 원본에만 묶음
+            root = next((roots.get(m) or m for m, _ in index.matches(sig)
+                         if ranks[roots.get(m) or m] == r.priority_rank), None)
+            roots[r.id] = root
+            ranks[r.id] = r.priority_rank
+            updates.append({"id": r.id, "dup_of": root})
+            sigs.append({"voc_id": r.id, "sig": to_blob(sig)})
+            index.add(r.id, sig)
+            n_dup += root is not None
+        db.session.execute(db.update(VOC), updates)
+        db.session.execute(db.insert(VocSignature), sigs)
+        last_id = rows[-1].id
+    db.session.commit()
+    with _dedup_lock:
+        _dedup_index = LshIndex()
+    return n_dup
+
+
+# ====================== 유틸: VOC 요약 작업 큐 ======================
+
+VOC_SUMMARY_BATCH = 8           # 한 번에 가져오는 작업 수
+VOC_SUMMARY_MAX_ATTEMPTS = 5
+VOC_SUMMARY_BACKOFF_SEC = 5.0   # 재시도 대기: 5s, 10s, 20s ...
+VOC_SUMMARY_LEASE_SEC = 300     # running 상태로 이보다 오래 남은 작업은 (프로세스 종료로 보고) 다시 대기
+VOC_SUMMARY_POLL_SEC = 2.0
+
+
+def claim_summary_jobs(limit: int):
+    """실행할 작업을 running으로 바꾸며 가져온다 (UPDATE ... RETURNING, 한 트랜잭션)"""
+    now = datetime.now()
+    db.session.execute(
+        db.update(VocJob)
+        .where(VocJob.state == "running",
+               VocJob.locked_at < now - timedelta(seconds=VOC_SUMMARY_LEASE_SEC))
+        .values(state="queued")
+        .execution_options(synchronize_session=False)
+    )
+    due = (db.select(VocJob.id)
+           .where(VocJob.state == "queued", VocJob.next_run_at <= now)
+           .order_by(VocJob.id).limit(limit))
+    jobs = db.session.execute(
+        db.update(VocJob)
+        .where(VocJob.id.in_(due))
+        .values(state="running", locked_at=now, attempts=VocJob.attempts + 1)
+        .returning(VocJob.id, VocJob.voc_id, VocJob.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return jobs
+
+
+def run_summary_job(job):
+    """작업 1건: 요약 저장 + 검색 색인 갱신 → 작업 삭제, 실패 시 백오프 후 재시도"""
+    voc = db.session.get(VOC, job.voc_id)
+    try:
+        if voc is not None:
+            voc.summary = summarize_with_llm(voc.content)
+            voc.status = "done"
+            index_voc(voc)
+        db.session.execute(db.delete(VocJob).where(VocJob.id == job.id))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        final = job.attempts >= VOC_SUMMARY_MAX_ATTEMPTS
+        wait = VOC_SUMMARY_BACKOFF_SEC * (2 ** (job.attempts - 1))
+        db.session.execute(
+            db.update(VocJob).where(VocJob.id == job.id).values(
+                state="failed" if final else "queued",
+                next_run_at=datetime.now() + timedelta(seconds=wait),
+                last_error=f"{type(e).__name__}: {e}"[:500],
+            )
+        )
+        if final:
+            db.session.execute(db.update(VOC).where(VOC.id == job.voc_id).values(status="failed"))
+        db.session.commit()
+        app.logger.warning("VOC %s 요약 실패(%s/%s회): %s",
+                           job.voc_id, job.attempts, VOC_SUMMARY_MAX_ATTEMPTS, e)
+
+
+class SummaryWorker:
+    """
+    VOC 요약 백그라운드 작업자
+    - 작업은 SQLite voc_job 테이블에 저장 (재시작해도 남은 작업 처리)
+    - 등록 시 notify()로 바로 깨우고, 그 외에는 poll_sec마다 확인
+    """
+
+    def __init__(self, flask_app, workers: int, poll_sec: float = VOC_SUMMARY_POLL_SEC):
+        self.app = flask_app
+        self.poll_sec = poll_sec
+        self._wakeup = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"voc-summary-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def run_once(self) -> int:
+        """작업 한 묶음 처리, 처리 건수 반환"""
+        with self.app.app_context():
+            jobs = claim_summary_jobs(VOC_SUMMARY_BATCH)
+            for job in jobs:
+                run_summary_job(job)
+            return len(jobs)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_sec)
+            self._wakeup.clear()
+            try:
+                while self.run_once():
+                    pass
+            except Exception:
+                app.logger.exception("VOC 요약 작업 처리 실패 (다음 주기에 재시도)")
+
+
+_summary_worker = None
+_summary_worker_lock = threading.Lock()
+
+
+def get_summary_worker():
+    """VOC_SUMMARY_WORKERS > 0일 때만 작업자 사용 (최초 호출 시 생성)"""
+    global _summary_worker
+    workers = app.config.get("VOC_SUMMARY_WORKERS") or 0
+    if workers <= 0:
+        return None
+    if _summary_worker is None:
+        with _summary_worker_lock:
+            if _summary_worker is None:
+                _summary_worker = SummaryWorker(app, workers)
+    return _summary_worker
+
+
 # ====================== 유틸: 생일/기념일 ======================
 
 WEEKDAY_KR = ["월", "화", "수", "목", "금", "토", "일"]
@@ -148,56 +923,90 @@ def format_display(d: date):
     return f"{d.month}월 {d.day}일 ({WEEKDAY_KR[d.weekday()]})"
 
 
-def load_birthdays_this_week():
-    raw = safe_load_json(BIRTHDAYS_JSON)
-    week_dates = this_week_dates()
-    today = date.today()
-    md_map = {(d.month, d.day): d for d in week_dates}
+BIRTHDAY_FIELDS = (("birthday", "생일"), ("anniversary", "기념일"))
+
+# 파일 (mtime, size)가 바뀔 때만 다시 읽어 (월, 일) -> [(종류, 이름), ...] 인덱스 구성
+_birthday_index = {"version": None, "by_md": {}}
+_birthday_lock = threading.Lock()
 
-    events = []
 
+def build_birthday_index(raw) -> dict:
+    by_md = {}
     for r in raw:
         name = (r.get("name") or "").strip()
         if not name:
             continue
+        for field, ev_type in BIRTHDAY_FIELDS:
+            md = mmdd_from_str(r.get(field))
+            if md:
+                by_md.setdefault(md, []).append((ev_type, name))
+    for events in by_md.values():
+        events.sort()
+    return by_md
 
-        # 생일
-        b = mmdd_from_str(r.get("birthday"))
-        if b and b in md_map:
-            d = md_map[b]
-            diff = (d - today).days
-            when = "오늘" if diff == 0 else f"D-{diff}" if diff > 0 else f"D+{abs(diff)}"
-            events.append({
-                "type": "생일",
-                "name": name,
-                "date": d,
-                "display": format_display(d),
-                "when": when,
-                "is_today": diff == 0,
-            })
 
-        # 기념일
-        a = mmdd_from_str(r.get("anniversary"))
-        if a and a in md_map:
-            d = md_map[a]
-            diff = (d - today).days
-            when = "오늘" if diff == 0 else f"D-{diff}" if diff > 0 else f"D+{abs(diff)}"
+def birthday_version():
+    """생일 파일 (mtime, size), 없으면 None"""
+    try:
+        st = os.stat(BIRTHDAYS_JSON)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def birthday_index() -> dict:
+    version = birthday_version()
+    if _birthday_index["version"] != version:
+        with _birthday_lock:
+            if _birthday_index["version"] != version:
+                raw = safe_load_json(BIRTHDAYS_JSON) if version else []
+                _birthday_index.update(version=version, by_md=build_birthday_index(raw))
+    return _birthday_index["by_md"]
+
+
+def load_birthday_events(start: date, days: int, today=None):
+    """start부터 days일 동안의 생일/기념일 (연말~연초 구간도 날짜 순회로 처리)"""
+    if today is None:
+        today = date.today()
+    by_md = birthday_index()
+
+    events = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        hits = by_md.get((d.month, d.day))
+        if not hits:
+            continue
+        diff = (d - today).days
+        when = "오늘" if diff == 0 else f"D-{diff}" if diff > 0 else f"D+{abs(diff)}"
+        display = format_display(d)
+        for ev_type, name in hits:
             events.append({
-                "type": "기념일",
+                "type": ev_type,
                 "name": name,
                 "date": d,
-                "display": format_display(d),
+                "display": display,
                 "when": when,
                 "is_today": diff == 0,
             })
-
-    events.sort(key=lambda x: (x["date"], x["type"], x["name"]))
     return events
 
 
+def load_birthdays_this_week():
+    today = date.today()
+    return load_birthday_events(this_week_dates(today)[0], 7, today)
+
+
 # ====================== 유틸: MTBI 데이터 ======================
 
-def load_mtbi_data():
+MTBI_RANGES = ("daily", "weekly", "monthly")
+MTBI_FIELDS = {"daily": "date", "weekly": "label", "monthly": "label"}
+
+# 차트 확대 단계별 최대 점 개수(미리 다운샘플링), 메인 페이지는 MTBI_PAGE_POINTS 사용
+MTBI_ZOOM_LEVELS = (90, 180, 365, 730)
+MTBI_PAGE_POINTS = 180
+
+
+def read_mtbi_file():
     """
     data/mtbi.json에서 MTBI 시계열을 읽어온다.
     형식 예:
@@ -207,7 +1016,7 @@ def load_mtbi_data():
       "monthly": [ {"label":"2025-10","mtbi":160.1}, ... ]
     }
     """
-    default = {"daily": [], "weekly": [], "monthly": []}
+    default = {k: [] for k in MTBI_RANGES}
     if not os.path.isfile(MTBI_JSON):
         return default
     try:
@@ -220,38 +1029,286 @@ def load_mtbi_data():
         return default
 
 
-# ====================== 라우트: 메인 ======================
+_mtbi_store = None
 
-@app.route("/")
-def home():
-    # 최신 전달사항 5개
-    top_ann = Announcement.query.order_by(Announcement.created_at.desc()).limit(5).all()
 
-    # 행사 사진 + 좋아요
-    images = list_event_images()
-    likes_map = {}
-    for it in images:
-        row = GalleryImage.query.filter_by(filename=it["name"]).first()
-        likes_map[it["name"]] = row.likes if row else 0
+def get_mtbi_store():
+    """배치 저장소(data/mtbi.sqlite3)가 있으면 MtbiStore, 없으면 None"""
+    global _mtbi_store
+    if _mtbi_store is None and os.path.isfile(MTBI_DB):
+        _mtbi_store = MtbiStore(MTBI_DB)
+    return _mtbi_store
+
+
+def read_mtbi_data():
+    """저장소(우선) 또는 mtbi.json에서 MTBI 시계열 읽기"""
+    store = get_mtbi_store()
+    if store is not None:
+        try:
+            return store.load_series()
+        except sqlite3.Error:
+            app.logger.exception("MTBI 저장소 읽기 실패 → mtbi.json 사용")
+    return read_mtbi_file()
+
+
+# 데이터 버전(저장소 version 또는 파일 mtime/size)이 바뀔 때만 다시 읽고, 다운샘플/직렬화 결과도 함께 보관
+_mtbi_cache = {"version": None, "data": None, "page": None, "page_json": None,
+               "range_json": {}, "levels": {}}
+_mtbi_lock = threading.Lock()
+
 
-    # 이번 주 생일/기념일
-    bday_events = load_birthdays_this_week()
+def mtbi_data_version() -> str:
+    store = get_mtbi_store()
+    if store is not None:
+        try:
+            return f"db-{store.version()}"
+        except sqlite3.Error:
+            pass
+    try:
+        st = os.stat(MTBI_JSON)
+    except OSError:
+        return "none"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def mtbi_cache():
+    version = mtbi_data_version()
+    if _mtbi_cache["version"] != version:
+        with _mtbi_lock:
+            if _mtbi_cache["version"] != version:
+                data = read_mtbi_data()
+                levels = {
+                    (k, n): downsample(data[k], n, MTBI_FIELDS[k])
+                    for k in MTBI_RANGES for n in MTBI_ZOOM_LEVELS
+                }
+                page = dict(data, **{k: levels[(k, MTBI_PAGE_POINTS)] for k in MTBI_RANGES})
+                _mtbi_cache.update(
+                    version=version,
+                    data=data,
+                    page=page,
+                    # home.html <script>에 그대로 넣을 수 있는 형태
+                    page_json=htmlsafe_json_dumps(page),
+                    range_json={
+                        k: json.dumps({"range": k, "items": data[k]}, ensure_ascii=False)
+                        for k in MTBI_RANGES
+                    },
+                    levels=levels,
+                )
+    return _mtbi_cache
+
+
+def load_mtbi_data():
+    """MTBI 시계열 (캐시)"""
+    return mtbi_cache()["data"]
+
+
+def mtbi_range_key(range_name: str, s: str) -> str:
+    """'YYYY-MM-DD' -> 해당 range의 비교 키 (daily=날짜, weekly=YYYY-Www, monthly=YYYY-MM)"""
+    d = datetime.strptime(s, "%Y-%m-%d").date()
+    if range_name == "weekly":
+        iso_year, iso_week, _ = d.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if range_name == "monthly":
+        return d.strftime("%Y-%m")
+    return d.strftime("%Y-%m-%d")
+
+
+def filter_mtbi_items(items, range_name: str, date_from: str, date_to: str):
+    field = MTBI_FIELDS[range_name]
+    lo = mtbi_range_key(range_name, date_from) if date_from else None
+    hi = mtbi_range_key(range_name, date_to) if date_to else None
+    return [
+        r for r in items
+        if (lo is None or str(r.get(field, "")) >= lo)
+        and (hi is None or str(r.get(field, "")) <= hi)
+    ]
 
-    # MTBI 데이터
-    mtbi = load_mtbi_data()
 
+# ====================== 유틸: HTTP 캐시/압축 ======================
+
+GZIP_MIN_BYTES = 1024   # 이보다 작은 응답은 압축 이득이 적어 그대로
+GZIP_LEVEL = 6
+GZIP_MIMETYPES = frozenset({"text/html", "text/css", "text/plain", "text/javascript",
+                            "application/json", "application/javascript"})
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def render_version() -> str:
+    """코드/템플릿 배포 버전 (app.py·templates 최신 mtime) — 배포 후 옛 ETag 무효화"""
+    paths = [os.path.abspath(__file__)]
+    tpl_dir = os.path.join(BASE_DIR, "templates")
+    if os.path.isdir(tpl_dir):
+        paths += [os.path.join(tpl_dir, f) for f in os.listdir(tpl_dir)]
+    return f"{max(os.stat(p).st_mtime_ns for p in paths):x}"
+
+
+RENDER_VERSION = render_version()
+
+
+def conditional(version_fn):
+    """
+    조건부 GET 데코레이터
+    - ETag = hash(배포 버전, 경로+쿼리, version_fn()) — version_fn은 뷰가 읽는 데이터의 버전
+      (DB 최대 id, 파일 mtime 등 가벼운 조회만)
+    - If-None-Match가 같으면 뷰를 실행하지 않고 304
+    - 200 응답에만 ETag + Cache-Control: no-cache (매번 재검증)
+    - 바이트가 아닌 데이터 기준 검증값이고 gzip 여부와도 무관하므로 weak ETag
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = hashlib.sha1(
+                f"{RENDER_VERSION}|{request.full_path}|{version_fn()}".encode()
+            ).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                resp = app.response_class(status=304)
+            else:
+                resp = app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.cache_control.no_cache = True
+            return resp
+        return wrapper
+    return decorator
+
+
+@app.after_request
+def http_cache_headers(resp):
+    """
+    - 행사 사진: 썸네일(이름에 원본 mtime 포함)과 ?v=mtime 붙은 원본은 1년 immutable
+    - 텍스트 응답: GZIP_MIN_BYTES 이상이고 클라이언트가 지원하면 gzip
+    """
+    if request.endpoint == "static":
+        path = (request.view_args or {}).get("filename", "")
+        if path.startswith("gallery/thumbs/") or (path.startswith("gallery/") and request.args.get("v")):
+            resp.cache_control.no_cache = None
+            resp.cache_control.public = True
+            resp.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+            resp.cache_control.immutable = True
+        return resp
+
+    if resp.mimetype not in GZIP_MIMETYPES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or request.accept_encodings["gzip"] <= 0):
+        return resp
+    data = resp.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return resp
+    resp.set_data(gzip.compress(data, GZIP_LEVEL, mtime=0))
+    resp.headers["Content-Encoding"] = "gzip"
+    # 같은 ETag로 다른 바이트를 보내므로 weak로 (RFC 9110)
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+
+# ====================== 유틸: 메인 화면 조각 캐시 ======================
+
+class FragmentCache:
+    """
+    위젯별 렌더링 결과(HTML) LRU 캐시
+    - 키 = (위젯, 데이터 버전...) → 버전이 바뀌면 자연히 새 키, 옛 항목은 LRU로 밀려남
+    - 쓰기 경로(전달사항 등록, 좋아요)는 invalidate(위젯)으로 즉시 제거
+    - ttl_sec이 지나면 다시 렌더링 (다른 프로세스의 쓰기 대비)
+    """
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self.maxsize = maxsize
+        self.ttl = ttl_sec
+        self._items = OrderedDict()  # key -> (만료 시각, html)
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: tuple, render):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None and (self.ttl <= 0 or hit[0] > now):
+                self._items.move_to_end(key)
+                return hit[1]
+        html = Markup(render())
+        with self._lock:
+            self._items[key] = (now + self.ttl, html)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return html
+
+    def invalidate(self, widget: str):
+        with self._lock:
+            for key in [k for k in self._items if k[0] == widget]:
+                del self._items[key]
+
+
+home_fragments = FragmentCache(app.config["HOME_FRAGMENT_CACHE_SIZE"],
+                               app.config["HOME_FRAGMENT_TTL_SEC"])
+
+
+def render_home_fragments() -> dict:
+    """메인 화면 위젯 4개 (캐시, 버전 확인은 stat/PK 조회 수준)"""
+    today = date.today()
+    ann = ann_cache()
+    gallery = gallery_index()
+
+    def gallery_html():
+        images = gallery["files"]
+        return render_template("home_gallery.html", images=images, thumbs=thumb_srcsets(images),
+                               likes=current_likes(it["name"] for it in images))
+
+    return {
+        "mtbi": home_fragments.get_or_render(
+            ("mtbi", mtbi_data_version()),
+            lambda: render_template("home_mtbi.html", mtbi=mtbi_cache()["page"])),
+        "announcements": home_fragments.get_or_render(
+            ("announcements", ann["max_id"]),
+            lambda: render_template("home_announcements.html", top_ann=ann["latest"])),
+        # 이번 주 범위와 D-n 표시는 날짜에 따라 바뀜
+        "birthdays": home_fragments.get_or_render(
+            ("birthdays", birthday_version(), today),
+            lambda: render_template("home_birthdays.html", bday_events=load_birthdays_this_week())),
+        # 좋아요 수는 다른 프로세스에서도 늘어나므로 전체 합계를 키에 포함 (home_version과 같은 값)
+        "gallery": home_fragments.get_or_render(
+            ("gallery", gallery["dir_mtime"], gallery_thumbnails.version, likes_version()),
+            gallery_html),
+    }
+
+
+# ====================== 라우트: 메인 ======================
+
+def home_version():
+    """메인 화면이 읽는 데이터 전부의 버전"""
+    return (mtbi_data_version(), ann_cache()["max_id"], birthday_version(), date.today(),
+            gallery_index()["dir_mtime"], gallery_thumbnails.version, likes_version())
+
+
+@app.route("/")
+@conditional(home_version)
+def home():
     return render_template(
         "home.html",
-        top_ann=top_ann,
-        images=images,
-        likes=likes_map,
-        bday_events=bday_events,
-        mtbi=mtbi
+        fragments=render_home_fragments(),
+        mtbi_json=mtbi_cache()["page_json"],
     )
 
 
 # ====================== 라우트: VOC ======================
 
+def insert_voc(fields: dict, sig_blob: bytes, queue_summary: bool) -> int:
+    """VOC 1건 + 검색 색인/서명/요약 작업을 한 트랜잭션에 (쓰기 큐에서 실행, commit은 호출부)"""
+    voc = VOC(**fields)
+    db.session.add(voc)
+    db.session.flush()   # id 확정
+    index_voc(voc)
+    db.session.add(VocSignature(voc_id=voc.id, sig=sig_blob))
+    if queue_summary:
+        db.session.add(VocJob(voc_id=voc.id))
+    return voc.id
+
+
 @app.route("/submit", methods=["GET", "POST"])
 def submit_voc():
     if request.method == "POST":
@@ -262,34 +1319,102 @@ def submit_voc():
         if not (writer and title and content):
             return render_template("submit.html", error="모든 항목을 입력해주세요.")
 
-        summary = summarize_with_llm(content)
+        # 우선순위는 사전 1회 스캔이라 바로 계산, 요약은 작업자가 있으면 비동기
         priority = classify_priority(content)
+        worker = get_summary_worker()
+        sig = minhash(content)
 
-        voc = VOC(
+        fields = dict(
             writer=writer,
             title=title,
             content=content,
-            summary=summary,
+            summary="" if worker else summarize_with_llm(content),
             priority=priority,
+            priority_rank=priority_rank(priority),
+            status="pending" if worker else "done",
+            dup_of=find_duplicate(sig, priority_rank(priority)),
         )
-        db.session.add(voc)
-        db.session.commit()
+        db_write(insert_voc, fields, to_blob(sig), worker is not None)
+        if worker:
+            worker.notify()
         return redirect(url_for("voc_board"))
 
     return render_template("submit.html")
 
 
+VOC_PAGE_SIZE = 20
+
+# 목록에 필요한 컬럼만 조회 (content 원문 제외)
+VOC_BOARD_COLUMNS = (
+    VOC.id, VOC.writer, VOC.title, VOC.summary,
+    VOC.priority, VOC.priority_rank, VOC.status, VOC.created_at,
+)
+
+
+def encode_voc_cursor(row) -> str:
+    """목록 마지막 행 -> 'rank.YYYYmmddHHMMSSffffff.id'"""
+    return f"{row.priority_rank}.{row.created_at:%Y%m%d%H%M%S%f}.{row.id}"
+
+
+def decode_voc_cursor(s: str):
+    """cursor 문자열 -> (rank, created_at, id), 형식 오류면 None"""
+    try:
+        rank, ts, vid = s.split(".")
+        return int(rank), datetime.strptime(ts, "%Y%m%d%H%M%S%f"), int(vid)
+    except (ValueError, AttributeError):
+        return None
+
+
+def voc_version():
+    """VOC 화면 데이터 버전 — 새 VOC(최대 id) + 마지막 변경 시각 (인덱스 두 번 끝 조회)"""
+    # max()를 한 SELECT에 같이 쓰면 SQLite min/max 최적화가 꺼져 인덱스 전체를 읽으므로 각각 서브쿼리
+    return db.session.execute(db.select(
+        db.select(db.func.max(VOC.id)).scalar_subquery(),
+        db.select(db.func.max(VOC.updated_at)).scalar_subquery(),
+    )).one()
+
+
 @app.route("/voc")
+@conditional(voc_version)
 def voc_board():
-    rows = VOC.query.order_by(VOC.created_at.desc()).all()
-    voc_list = sorted(rows, key=lambda v: (priority_rank(v.priority), v.created_at), reverse=True)
-    return render_template("dashboard.html", voc_list=voc_list)
+    # 우선순위 → 최신순, ix_voc_board_roots (dup_of IS NULL 구간) 역순 탐색
+    # 유사 중복은 원본 VOC 아래 건수로만 표시
+    q = VOC.query.with_entities(*VOC_BOARD_COLUMNS).filter(VOC.dup_of.is_(None)).order_by(
+        VOC.priority_rank.desc(), VOC.created_at.desc(), VOC.id.desc()
+    )
+    cursor = decode_voc_cursor(request.args.get("after", ""))
+    if cursor:
+        q = q.filter(tuple_(VOC.priority_rank, VOC.created_at, VOC.id) < cursor)
+
+    rows = q.limit(VOC_PAGE_SIZE + 1).all()
+    next_cursor = encode_voc_cursor(rows[VOC_PAGE_SIZE - 1]) if len(rows) > VOC_PAGE_SIZE else None
+    rows = rows[:VOC_PAGE_SIZE]
+    return render_template(
+        "dashboard.html",
+        voc_list=rows,
+        dup_counts=duplicate_counts([r.id for r in rows]),
+        next_cursor=next_cursor,
+        is_first_page=cursor is None,
+    )
+
+
+@app.route("/voc/search")
+@conditional(voc_version)
+def voc_search():
+    q = (request.args.get("q") or "").strip()
+    # 범위 밖 page는 잘라서 처리 (아주 큰 값은 SQLite OFFSET 정수 범위를 넘음)
+    page = min(max(1, request.args.get("page", 1, type=int)), VOC_SEARCH_MAX_PAGES)
+    rows, has_next = search_voc(q, page) if q else ([], False)
+    return render_template("voc_search.html", q=q, page=page, voc_list=rows, has_next=has_next)
 
 
 @app.route("/voc/<int:voc_id>")
+@conditional(voc_version)
 def voc_detail(voc_id):
     voc = VOC.query.get_or_404(voc_id)
-    return render_template("detail.html", voc=voc)
+    duplicates = (VOC.query.with_entities(VOC.id, VOC.title, VOC.writer, VOC.created_at)
+                  .filter(VOC.dup_of == voc.id).order_by(VOC.id).all())
+    return render_template("detail.html", voc=voc, duplicates=duplicates)
 
 
 @app.route("/dashboard")
@@ -307,41 +1432,163 @@ def api_gallery_like():
         return jsonify(ok=False, error="filename required"), 400
 
     filename = os.path.basename(filename)
-    full = os.path.join(GALLERY_DIR, filename)
-    if not os.path.isfile(full):
+    if filename not in gallery_index()["names"]:
         return jsonify(ok=False, error="file not found"), 404
 
-    row = get_or_create_image_row(filename)
-    row.likes += 1
-    db.session.commit()
-    return jsonify(ok=True, likes=row.likes)
+    likes = add_like(filename)
+    return jsonify(ok=True, likes=likes)
+
+
+# ====================== 라우트: MTBI API ======================
+
+@app.route("/api/mtbi")
+@conditional(mtbi_data_version)
+def api_mtbi():
+    range_name = request.args.get("range", "daily")
+    date_from = (request.args.get("from") or "").strip()
+    date_to = (request.args.get("to") or "").strip()
+    if range_name not in MTBI_RANGES:
+        return jsonify(ok=False, error="range must be daily, weekly or monthly"), 400
+    # max_points 없음/0 → 원본 값 그대로, N → LTTB로 N개 이하로 축소
+    try:
+        max_points = int(request.args.get("max_points") or 0)
+    except ValueError:
+        return jsonify(ok=False, error="max_points must be an integer"), 400
+
+    cache = mtbi_cache()
+    if date_from or date_to:
+        try:
+            items = filter_mtbi_items(cache["data"][range_name], range_name, date_from, date_to)
+        except ValueError:
+            return jsonify(ok=False, error="from/to must be YYYY-MM-DD"), 400
+        items = downsample(items, max_points, MTBI_FIELDS[range_name])
+        body = json.dumps({"range": range_name, "items": items}, ensure_ascii=False)
+    elif max_points > 0:
+        items = cache["levels"].get((range_name, max_points))
+        if items is None:
+            items = downsample(cache["data"][range_name], max_points, MTBI_FIELDS[range_name])
+        body = json.dumps({"range": range_name, "items": items}, ensure_ascii=False)
+    else:
+        body = cache["range_json"][range_name]
+    return app.response_class(body, mimetype="application/json")
+
+
+@app.route("/api/mtbi/equipment")
+@conditional(mtbi_data_version)
+def api_mtbi_equipment():
+    """
+    설비별 MTBI drilldown: 기간 내 MTBI 최저 설비(또는 large_class) top N
+    ?range=daily|weekly|monthly&period=<YYYY-MM-DD|YYYY-Www|YYYY-MM>&top=10&by=equipment|large_class
+    (period 생략 시 가장 최근 기간)
+    """
+    range_name = request.args.get("range", "daily")
+    by = request.args.get("by", "equipment")
+    period = (request.args.get("period") or "").strip()
+    if range_name not in MTBI_RANGES:
+        return jsonify(ok=False, error="range must be daily, weekly or monthly"), 400
+    if by not in ("equipment", "large_class"):
+        return jsonify(ok=False, error="by must be equipment or large_class"), 400
+    try:
+        top = min(100, max(1, int(request.args.get("top") or 10)))
+    except ValueError:
+        return jsonify(ok=False, error="top must be an integer"), 400
+
+    store = get_mtbi_store()
+    if store is None:
+        return jsonify(ok=False, error="MTBI store not found"), 404
+    period = period or store.latest_label(range_name)
+    try:
+        items = store.worst_equipment(range_name, period, top, by) if period else []
+    except ValueError:
+        return jsonify(ok=False, error="period must be YYYY-MM-DD for daily"), 400
+    return jsonify(ok=True, range=range_name, period=period, by=by, items=items)
 
 
 # ====================== 라우트: 전달사항 ======================
 
+ANN_PAGE_SIZE = 5
+ANN_LATEST_N = 5  # 메인 화면 최신 전달사항 수
+
+ANN_LIST_COLUMNS = (Announcement.id, Announcement.title, Announcement.created_at)
+
+# 전체 건수 + 최신 N개 캐시: 등록 시 무효화, 다른 프로세스 등록은 최대 id로 감지
+_ann_cache = {"max_id": None, "count": 0, "latest": []}
+_ann_cache_lock = threading.Lock()
+
+
+def ann_cache() -> dict:
+    """{"max_id", "count", "latest"} — 최대 id(PK 끝 1건 조회)가 같으면 재사용"""
+    global _ann_cache
+    max_id = db.session.query(db.func.max(Announcement.id)).scalar() or 0
+    cached = _ann_cache
+    if cached["max_id"] == max_id:
+        return cached
+    with _ann_cache_lock:
+        if _ann_cache["max_id"] != max_id:
+            latest = (Announcement.query.with_entities(*ANN_LIST_COLUMNS)
+                      .order_by(Announcement.created_at.desc(), Announcement.id.desc())
+                      .limit(ANN_LATEST_N).all())
+            _ann_cache = {"max_id": max_id, "count": Announcement.query.count(), "latest": latest}
+        return _ann_cache
+
+
+def invalidate_ann_cache():
+    global _ann_cache
+    with _ann_cache_lock:
+        _ann_cache = {"max_id": None, "count": 0, "latest": []}
+
+
+def encode_ann_cursor(row) -> str:
+    """목록 마지막 행 -> 'YYYYmmddHHMMSSffffff.id'"""
+    return f"{row.created_at:%Y%m%d%H%M%S%f}.{row.id}"
+
+
+def decode_ann_cursor(s: str):
+    """cursor 문자열 -> (created_at, id), 형식 오류면 None"""
+    try:
+        ts, aid = s.split(".")
+        return datetime.strptime(ts, "%Y%m%d%H%M%S%f"), int(aid)
+    except (ValueError, AttributeError):
+        return None
+
+
 @app.route("/announcements")
+@conditional(lambda: ann_cache()["max_id"])
 def announcements_list():
-    per_page = 5
-    page = max(1, int(request.args.get("page", 1)))
-    q = Announcement.query.order_by(Announcement.created_at.desc())
-    total = q.count()
-    items = q.offset((page - 1) * per_page).limit(per_page).all()
-    total_pages = max(1, ceil(total / per_page))
+    # 최신순, (created_at, id) 인덱스 역순 탐색 — 몇 번째 페이지든 비용 동일
+    q = Announcement.query.with_entities(*ANN_LIST_COLUMNS).order_by(
+        Announcement.created_at.desc(), Announcement.id.desc()
+    )
+    cursor = decode_ann_cursor(request.args.get("after", ""))
+    if cursor:
+        q = q.filter(tuple_(Announcement.created_at, Announcement.id) < cursor)
 
+    rows = q.limit(ANN_PAGE_SIZE + 1).all()
+    next_cursor = encode_ann_cursor(rows[ANN_PAGE_SIZE - 1]) if len(rows) > ANN_PAGE_SIZE else None
     return render_template(
         "announcements_list.html",
-        items=items,
-        page=page,
-        total_pages=total_pages,
+        items=rows[:ANN_PAGE_SIZE],
+        total=ann_cache()["count"],
+        next_cursor=next_cursor,
+        is_first_page=cursor is None,
     )
 
 
 @app.route("/announcements/<int:ann_id>")
+@conditional(lambda: "")  # 등록 후 수정되지 않음 → 경로(id)와 배포 버전만으로 충분
 def announcements_detail(ann_id):
     ann = Announcement.query.get_or_404(ann_id)
     return render_template("announcements_detail.html", ann=ann)
 
 
+def insert_announcement(title: str, body: str) -> int:
+    """쓰기 큐에서 실행, commit은 호출부"""
+    ann = Announcement(title=title, body=body)
+    db.session.add(ann)
+    db.session.flush()
+    return ann.id
+
+
 @app.route("/announcements/new", methods=["GET", "POST"])
 def announcements_new():
     if request.method == "POST":
@@ -349,18 +1596,116 @@ def announcements_new():
         body = (request.form.get("body") or "").strip()
         if not (title and body):
             return render_template("announcements_new.html", error="제목과 내용을 입력해주세요.")
-        ann = Announcement(title=title, body=body)
-        db.session.add(ann)
-        db.session.commit()
+        db_write(insert_announcement, title, body)
+        invalidate_ann_cache()
+        home_fragments.invalidate("announcements")
         return redirect(url_for("announcements_list"))
 
     return render_template("announcements_new.html")
 
 
+# ====================== CLI ======================
+
+@app.cli.command("init-db")
+def init_db_command():
+    """DB 테이블/컬럼/인덱스/검색 색인 테이블 생성·보정 (배포 후 1회, 웹 워커 시작 전 권장)"""
+    ensure_schema()
+    click.echo("DB 스키마 확인 완료")
+
+
+@app.cli.command("voc-fts-rebuild")
+def voc_fts_rebuild_command():
+    """VOC 검색 색인(voc_fts) 전체 재구축"""
+    ensure_schema()
+    click.echo(f"VOC 검색 색인 재구축: {rebuild_voc_fts()}건")
+
+
+@app.cli.command("voc-reclassify")
+@click.option("--batch", default=500, show_default=True, help="한 번에 읽어 갱신할 VOC 수")
+@click.option("--dry-run", is_flag=True, help="변경 건수만 출력하고 저장하지 않음")
+def voc_reclassify_command(batch, dry_run):
+    """우선순위 사전 변경 후 기존 VOC 전체 재분류 (id 순 keyset 배치)"""
+    ensure_schema()
+    rules = get_rules(PRIORITY_KEYWORDS_JSON)
+    seen = changed = 0
+    moves = {}
+    last_id = 0
+    while True:
+        rows = (VOC.query.with_entities(VOC.id, VOC.content, VOC.priority)
+                .filter(VOC.id > last_id).order_by(VOC.id).limit(batch).all())
+        if not rows:
+            break
+        updates = []
+        for r in rows:
+            p = rules.classify(r.content)
+            if p != r.priority:
+                updates.append({"id": r.id, "priority": p, "priority_rank": priority_rank(p)})
+                moves[(r.priority, p)] = moves.get((r.priority, p), 0) + 1
+        if updates and not dry_run:
+            db.session.execute(db.update(VOC), updates)
+            db.session.commit()
+        seen += len(rows)
+        changed += len(updates)
+        last_id = rows[-1].id
+    for (old, new), n in sorted(moves.items()):
+        click.echo(f"  {old} → {new}: {n}건")
+    click.echo(f"VOC 재분류{' (dry-run)' if dry_run else ''}: {seen}건 중 {changed}건 변경")
+    if changed and not dry_run:
+        # 원본과 우선순위가 달라진 중복은 묶음에서 빼서 목록에 직접 표시 (find_duplicate 규칙 유지)
+        detached = detach_mismatched_duplicates()
+        db.session.commit()
+        if detached:
+            click.echo(f"  원본과 우선순위가 달라진 중복 {detached}건 분리 "
+                       f"(다시 묶으려면 flask voc-dedup-rebuild)")
+
+
+@app.cli.command("voc-dedup-rebuild")
+def voc_dedup_rebuild_command():
+    """기존 VOC 유사 중복 서명/묶음 전체 재계산"""
+    ensure_schema()
+    click.echo(f"VOC 유사 중복 재계산: 중복 {rebuild_voc_dedup()}건")
+
+
+@app.cli.command("gallery-thumbs")
+@click.option("--prune/--no-prune", default=True, show_default=True,
+              help="원본이 없거나 바뀐 옛 썸네일 삭제")
+def gallery_thumbs_command(prune):
+    """행사 사진 썸네일 일괄 생성 (새 사진 추가 후 미리 실행하면 첫 화면부터 축소본 사용)"""
+    if not gallery_thumbs.available():
+        raise click.ClickException("Pillow가 설치되어 있지 않습니다 (pip install Pillow).")
+    files = list_event_images()
+    ok, failed = gallery_thumbnails.build_all(files)
+    removed = gallery_thumbnails.prune(files) if prune else 0
+    click.echo(f"썸네일 생성({gallery_thumbnails.ext}): {ok}장, 실패 {failed}장, 옛 파일 삭제 {removed}개")
+
+
 # ====================== 시작 부분 ======================
 
+_services_started = False
+_services_lock = threading.Lock()
+
+
+def start_services():
+    """프로세스당 1회: 스키마 보정 + 요약 작업자 시작 (이전 실행/다른 워커에서 남은 작업 처리)"""
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        with app.app_context():
+            ensure_schema()
+        get_summary_worker()
+        _services_started = True
+
+
+@app.before_request
+def start_services_on_first_request():
+    # WSGI 서버(워커 여러 개)에서는 __main__이 실행되지 않으므로 워커별 첫 요청에서 시작
+    start_services()
+
+
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
+    start_services()
     # 사내망 접근 가능
     app.run(host="127.0.0.1", port=8000, debug=False)
@@ -0,0 +1,198 @@
+"""
+행사 사진 썸네일 (미리 만든 WebP/JPEG 축소본, app.py 공용)
+
+- 원본: static/gallery/events/<name>
+- 썸네일: static/gallery/thumbs/<원본 이름>.<원본 mtime_ns 16진>.<폭>w.webp
+  원본이 바뀌면(mtime) 이름이 달라지므로 캐시 무효화가 따로 필요 없다. 옛 파일은 prune()
+- 생성은 프로세스 풀에서 (이미지 디코딩/리사이즈는 CPU 작업이라 스레드로는 GIL에 막힘)
+  웹 프로세스는 스레드가 여럿이라 fork 대신 spawn으로 워커 시작 (잠긴 락이 복사되는 교착 방지)
+- Pillow가 없으면 썸네일 없이 원본을 그대로 쓴다 (available() == False)
+- WebP 인코더가 없는 Pillow 빌드면 JPEG
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow 미설치 → 원본 표시
+    Image = None
+
+THUMB_WIDTHS = (320, 640)   # 카드 폭(약 320px) 1x / 2x
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+Variants = List[Tuple[int, str]]  # [(폭, 썸네일 파일명), ...] 폭 오름차순
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def thumb_ext() -> str:
+    return "webp" if Image is not None and features.check("webp") else "jpg"
+
+
+def thumb_name(name: str, mtime_ns: int, width: int, ext: str) -> str:
+    return f"{name}.{mtime_ns:x}.{width}w.{ext}"
+
+
+def make_thumbs(src_path: str, thumb_dir: str, name: str, mtime_ns: int,
+                widths=THUMB_WIDTHS, ext: str = "webp") -> Variants:
+    """원본 1장 -> 폭별 썸네일 (이미 있으면 건너뜀, 원본보다 큰 폭은 만들지 않음)"""
+    out = []
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        targets = sorted({min(w, im.width) for w in widths})
+        for w in targets:
+            fname = thumb_name(name, mtime_ns, w, ext)
+            dest = os.path.join(thumb_dir, fname)
+            if not os.path.exists(dest):
+                h = max(1, round(im.height * w / im.width))
+                small = im.resize((w, h), Image.LANCZOS)
+                if ext == "webp":
+                    small = small.convert("RGBA" if "A" in small.getbands() else "RGB")
+                    opts = {"format": "WEBP", "quality": WEBP_QUALITY, "method": 4}
+                else:
+                    small = small.convert("RGB")
+                    opts = {"format": "JPEG", "quality": JPEG_QUALITY, "optimize": True}
+                # 쓰는 중인 파일이 노출되지 않도록 임시 파일 → rename
+                tmp = f"{dest}.{os.getpid()}.tmp"
+                small.save(tmp, **opts)
+                os.replace(tmp, dest)
+            out.append((w, fname))
+    return out
+
+
+class ThumbnailPipeline:
+    """
+    썸네일 준비 상태 관리 + 백그라운드 생성
+    - variants(): 준비된 썸네일만 돌려준다 (없으면 원본 사용, 요청은 기다리지 않음)
+    - ensure(): 없는 썸네일을 프로세스 풀에 맡기고, 끝나면 on_ready() 호출
+    - version: 썸네일이 추가될 때마다 증가 → 화면 캐시 키에 사용
+    """
+
+    def __init__(self, src_dir: str, thumb_dir: str, workers: int = 2, on_ready=None):
+        self.src_dir = src_dir
+        self.thumb_dir = thumb_dir
+        self.workers = max(1, workers)
+        self.on_ready = on_ready
+        self.ext = thumb_ext()
+        self.version = 0
+        self._ready: Dict[Tuple[str, int], Variants] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._scanned = False
+
+    def _scan(self):
+        """기존 썸네일 폴더를 한 번 읽어 준비 상태 복원"""
+        found: Dict[Tuple[str, int], Variants] = {}
+        if os.path.isdir(self.thumb_dir):
+            for fname in os.listdir(self.thumb_dir):
+                parts = fname.rsplit(".", 3)  # name, mtime, 폭w, 확장자
+                if len(parts) != 4 or parts[3] != self.ext or not parts[2].endswith("w"):
+                    continue
+                try:
+                    key = (parts[0], int(parts[1], 16))
+                    width = int(parts[2][:-1])
+                except ValueError:
+                    continue
+                found.setdefault(key, []).append((width, fname))
+        for v in found.values():
+            v.sort()
+        self._ready.update(found)
+        self._scanned = True
+
+    def variants(self, name: str, mtime_ns: int) -> Variants:
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            return self._ready.get((name, mtime_ns), [])
+
+    def ensure(self, files: Iterable[Dict]):
+        """files: gallery 목록 항목({"name", "mtime_ns"}) — 준비/진행 중이 아닌 것만 생성 요청"""
+        if not available():
+            return
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            todo = [(f["name"], f["mtime_ns"]) for f in files
+                    if (f["name"], f["mtime_ns"]) not in self._ready
+                    and (f["name"], f["mtime_ns"]) not in self._pending]
+            if not todo:
+                return
+            if self._pool is None:
+                os.makedirs(self.thumb_dir, exist_ok=True)
+                self._pool = _process_pool(self.workers)
+            for key in todo:
+                self._pending.add(key)
+                fut = self._pool.submit(make_thumbs, os.path.join(self.src_dir, key[0]),
+                                        self.thumb_dir, key[0], key[1], THUMB_WIDTHS, self.ext)
+                fut.add_done_callback(lambda f, key=key: self._done(key, f))
+
+    def _done(self, key, fut):
+        with self._lock:
+            self._pending.discard(key)
+            try:
+                self._ready[key] = fut.result()
+            except Exception:
+                # 깨진 파일 등은 원본으로 표시 (다음 ensure에서 다시 시도하지 않도록 빈 목록)
+                self._ready[key] = []
+                return
+            self.version += 1
+        if self.on_ready:
+            self.on_ready()
+
+    def build_all(self, files: Iterable[Dict]) -> Tuple[int, int]:
+        """모든 썸네일을 풀에서 만들고 끝날 때까지 대기 → (성공, 실패) 수 (CLI용)"""
+        files = list(files)
+        ok = failed = 0
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        with _process_pool(self.workers) as pool:
+            futs = {
+                pool.submit(make_thumbs, os.path.join(self.src_dir, f["name"]), self.thumb_dir,
+                            f["name"], f["mtime_ns"], THUMB_WIDTHS, self.ext): (f["name"], f["mtime_ns"])
+                for f in files
+            }
+            for fut, key in futs.items():
+                try:
+                    variants = fut.result()
+                except Exception:
+                    failed += 1
+                    continue
+                with self._lock:
+                    self._ready[key] = variants
+                    self.version += 1
+                ok += 1
+        return ok, failed
+
+    def prune(self, files: Iterable[Dict]) -> int:
+        """현재 원본(이름, mtime)에 해당하지 않는 썸네일 삭제 → 삭제 수"""
+        keep = {(f["name"], f["mtime_ns"]) for f in files}
+        removed = 0
+        if not os.path.isdir(self.thumb_dir):
+            return 0
+        for fname in os.listdir(self.thumb_dir):
+            parts = fname.rsplit(".", 3)
+            try:
+                key = (parts[0], int(parts[1], 16))
+            except (IndexError, ValueError):
+                key = None
+            if key not in keep:
+                try:
+                    os.remove(os.path.join(self.thumb_dir, fname))
+                    removed += 1
+                except OSError:
+                    pass
+        with self._lock:
+            for key in [k for k in self._ready if k not in keep]:
+                del self._ready[key]
+        return removed
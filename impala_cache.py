@@ -0,0 +1,118 @@
+"""
+Impala 원본 조회 결과 로컬 캐시 (SQLite 파일 1개)
+
+- D-2 이전 데이터는 바뀌지 않으므로, 확정된 날짜 범위의 getData 결과를 디스크에 저장
+- 키 = 조회 param 전체(JSON, 키 정렬)의 SHA-1 → 테이블/날짜/조건이 같을 때만 적중
+- 명시적 무효화: 전체 / 테이블별 / 특정 날짜 이후
+- 용량 제한: 초과 시 가장 오래 안 쓴 항목부터 삭제(LRU)
+"""
+
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Optional
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_cache (
+    key         TEXT PRIMARY KEY,
+    table_name  TEXT NOT NULL,
+    last_day    TEXT NOT NULL,
+    param       TEXT NOT NULL,
+    payload     BLOB NOT NULL,
+    nbytes      INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_raw_cache_accessed ON raw_cache (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_raw_cache_table_day ON raw_cache (table_name, last_day);
+"""
+
+
+def param_key(param: Dict) -> str:
+    return hashlib.sha1(
+        json.dumps(param, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class ResultCache:
+    """getData 결과(DataFrame) 디스크 캐시"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """연결 → (성공 시 commit) → close"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, param: Dict) -> Optional[pd.DataFrame]:
+        key = param_key(param)
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT payload FROM raw_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE raw_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, param: Dict, df: Optional[pd.DataFrame], last_day: date):
+        payload = pickle.dumps(df if df is not None else pd.DataFrame(),
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO raw_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (param_key(param), str(param.get("table_name", "")), last_day.isoformat(),
+                 json.dumps(param, sort_keys=True, ensure_ascii=False, default=str),
+                 payload, len(payload), now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """총 용량이 max_bytes를 넘으면 오래 안 쓴 항목부터 삭제"""
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM raw_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, nbytes in conn.execute(
+            "SELECT key, nbytes FROM raw_cache ORDER BY accessed_at"
+        ).fetchall():
+            conn.execute("DELETE FROM raw_cache WHERE key = ?", (key,))
+            total -= nbytes
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, table_name: Optional[str] = None, since: Optional[date] = None) -> int:
+        """조건에 맞는 항목 삭제 (인자 없으면 전체), 삭제 건수 반환"""
+        where, args = [], []
+        if table_name:
+            where.append("table_name = ?")
+            args.append(table_name)
+        if since:
+            where.append("last_day >= ?")
+            args.append(since.isoformat())
+        sql = "DELETE FROM raw_cache" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._lock, self._connect() as conn:
+            return conn.execute(sql, args).rowcount
+
+    def stats(self) -> Dict:
+        with self._lock, self._connect() as conn:
+            n, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM raw_cache"
+            ).fetchone()
+        return {"entries": n, "bytes": total}
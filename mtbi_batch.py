@@ -2,47 +2,109 @@
 MTBI 배치 스크립트 (D-2까지 저장/갱신 · 주/월=합계기반 · work_date 조건 추가 · 최종본)
 
 요구사항:
-- 오늘(당일)과 어제(D-1)는 제외하고, **이틀 전(D-2)**까지만 mtbi.json에 저장/갱신
+- 오늘(당일)과 어제(D-1)는 제외하고, **이틀 전(D-2)**까지만 저장/갱신
+- 저장소: data/mtbi.sqlite3 (daily/weekly/monthly 테이블, 트랜잭션 upsert, app.py와 공용)
+  mtbi.json은 필요할 때만 만드는 내보내기 파일 (--json, 전체 이력을 다시 쓰므로 기본은 생략)
 - 초기 구축(--init-days N): 과거 N일치 생성 (끝= D-2)
 - 일일 누적(--update): D-2 하루치만 계산/반영 (덮어쓰기 아님, 해당 날짜만 교체/추가)
 - 스케줄(--schedule HH:MM): 매일 지정 시각에 --update 실행(무한 루프)
 - daily 항목: {"date","work","err","mtbi"}
 - weekly/monthly: daily의 work/err **합계**로 MTBI 계산 (단순 평균 아님)
-- get_work_time()의 param에 work_date(YYMMDD) 조건 추가
+- 가동시간 조회(fetch_work_day/fetch_work_range)에 work_date(YYMMDD) 조건 추가
+- 초기 구축은 기본적으로 기간 전체를 테이블별 1회 조회(bulk) 후 로컬에서 일자별 집계
+  (--mode daily 로 하루 2회 조회 방식 사용 가능, --workers N 으로 N일 동시 조회)
+- 조회는 타임아웃(--timeout) + 지수 백오프 재시도(--retries), 끝내 실패한 날은
+  0으로 저장하지 않고 누락(missing)으로 남긴다
+- D-2 이전(확정) 날짜의 원본 조회 결과는 data/impala_cache.sqlite3에 캐시
+  (--no-cache, --cache-clear, --cache-invalidate-from YYYY-MM-DD, --cache-max-mb)
+- 추세(ma7/ma28 이동 MTBI, 28일 P10~P90 밴드, 전주·직전 기간 대비 delta)도 저장 시 함께 계산
+- 설비별/large_class별 일·주·월 MTBI도 같은 조회 결과로 한 번에 집계해 저장 (app /api/mtbi/equipment)
+- 조회는 SUM/COUNT ... GROUP BY 를 pushdown → (일자 × 설비)당 1행만 전송
+  (커넥터가 pushdown 미지원이면 mtbi_source가 원본 행을 받아 같은 결과로 로컬 집계)
+  설비 컬럼이 없는 테이블이면 일자당 1행(전체 합계)으로 다시 조회 → 공장 전체 MTBI만 저장
+- 누락 보충(--catch-up, --schedule 시작 시/매 점검): 저장 안 된 날짜 + work/err=0 의심 날짜를
+  찾아 기간 1회 조회로 다시 계산. 모든 실행은 잠금 파일(data/mtbi_batch.lock)로 직렬화
+- 데이터 소스 교체 가능: --source synthetic (Impala 없이 합성 데이터, mtbi_source.py)
+  성능 측정은 mtbi_bench.py
 
 예시:
 1) 초기 구축 120일
    python mtbi_batch.py --init-days 120
+   python mtbi_batch.py --init-days 120 --mode daily   # 일 단위 조회
+   python mtbi_batch.py --init-days 120 --mode daily --workers 4 --timeout 120 --retries 3
 
 2) 매일 06:05에 자동 갱신(무한 실행)
    python mtbi_batch.py --schedule 06:05
 
 3) 작업 스케줄러에서 매일 한 번 실행(권장)
    python mtbi_batch.py --update
+
+4) 최근 60일 누락/의심(work 또는 err=0) 날짜 보충
+   python mtbi_batch.py --catch-up --lookback 60
 """
 
 import os
 import sys
-import json
 import time
+import random
 import argparse
+import threading
 import traceback
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional
 
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from impala_cache import ResultCache
+from mtbi_store import MtbiStore
+from mtbi_source import DataSource, ImpalaSource, MissingColumnError, get_source
+
 # ====================== TODO: 환경에 맞게 수정 ======================
 
-# 실제 환경의 getData import (예: from common.impala_connector import getData)
-from your_impala_module import getData  # ← 실제 모듈/경로로 교체하세요
+# 실제 환경의 getData 모듈은 mtbi_source.IMPALA_MODULE 에서 지정
+# (--source synthetic 으로 Impala 없이 합성 데이터로 실행 가능)
 
 TABLE_RUNTIME = "YOUR_RUNTIME_TABLE"    # 전체 설비 가동시간 테이블명
 TABLE_ERROR   = "YOUR_ERROR_TABLE"      # 전체 설비 에러 테이블명
 LARGE_CLASS   = "MMM"
+EQUIP_COL     = "eqp_id"                # 설비 식별 컬럼 (가동시간/에러 테이블 공통)
+CLASS_COL     = "large_class"           # 설비 대분류 컬럼
+
+QUERY_TIMEOUT_SEC = 300.0  # getData 1회 호출 제한 시간
+QUERY_RETRIES     = 3      # 실패/타임아웃 시 재시도 횟수
+RETRY_BACKOFF_SEC = 2.0    # 재시도 대기: 2s, 4s, 8s ... (+지터)
+QUERY_WORKERS     = 1      # --mode daily 동시 조회 일수
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 MTBI_JSON_PATH = os.path.join(DATA_DIR, "mtbi.json")
+MTBI_DB_PATH = os.path.join(DATA_DIR, "mtbi.sqlite3")
+EXPORT_JSON = False  # mtbi.json 내보내기 여부 (--json 으로 켬, 앱은 저장소를 직접 읽음)
+RAW_CACHE_PATH = os.path.join(DATA_DIR, "impala_cache.sqlite3")
+RAW_CACHE_MAX_MB = 512
+LOCK_PATH = os.path.join(DATA_DIR, "mtbi_batch.lock")
+
+GAP_LOOKBACK_DAYS = 60      # 누락/의심 날짜 점검 범위 (D-2부터 과거 N일)
+GAP_CHECK_SEC = 600         # 스케줄 대기 중 점검 간격
+
+# 확정 데이터 원본 캐시 (main()에서 생성, None이면 사용 안 함)
+RAW_CACHE: Optional[ResultCache] = None
+
+# 조회 데이터 소스 (기본: Impala getData)
+DATA_SOURCE: DataSource = ImpalaSource()
+
+def getData(param: Dict):
+    """현재 데이터 소스로 조회 (기존 getData(param=...) 호출 형태 유지)"""
+    return DATA_SOURCE.get_data(param)
 
 # ====================== 로깅 ======================
 
@@ -81,9 +143,92 @@ def two_days_ago(today: date) -> date:
 
 # ====================== Impala 조회 ======================
 
-def get_work_time(target_date: date) -> int:
+ERROR_CODE_CONDITIONS = [
+    "error_code >= '0'",
+    "error_code < 'A'",
+    "error_code != ' '",
+]
+
+class QueryError(Exception):
+    """재시도 후에도 조회 실패 (해당 일은 0이 아니라 누락으로 처리)"""
+
+class SchemaError(QueryError):
+    """설비/대분류 컬럼 없음 등 테이블 구조 문제 — 재시도하지 않음, 설비별 집계만 포기 가능"""
+
+def call_with_timeout(fn, timeout: float):
+    """
+    fn()을 별도 스레드에서 실행하고 timeout초 안에 끝나지 않으면 TimeoutError
+    - getData는 중단할 수 없으므로 시간 초과된 호출은 백그라운드에서 끝까지 실행됨
+    """
+    box = {}
+
+    def run():
+        try:
+            box["result"] = fn()
+        except BaseException as e:
+            box["error"] = e
+
+    t = threading.Thread(target=run, name="getData", daemon=True)
+    t.start()
+    t.join(timeout)
+    if t.is_alive():
+        raise TimeoutError(f"{timeout:g}초 초과")
+    if "error" in box:
+        raise box["error"]
+    return box.get("result")
+
+def query(param: Dict, tag: str, last_day: date, refresh: bool = False):
+    """
+    getData + 타임아웃 + 지수 백오프 재시도, 끝내 실패하면 QueryError
+    - last_day(조회 범위의 마지막 날)가 D-2 이전이면 확정 데이터 → 로컬 캐시 사용
+    - refresh=True: 캐시를 읽지 않고 다시 조회해 덮어쓰기 (누락/의심 날짜 재조회)
+    """
+    cacheable = RAW_CACHE is not None and last_day <= two_days_ago(today_local())
+    if cacheable and not refresh:
+        df = RAW_CACHE.get(param)
+        if df is not None:
+            log(f"{tag} 캐시 적중 ({len(df)}행)")
+            return df
+    df = fetch_with_retry(param, tag)
+    if cacheable:
+        RAW_CACHE.put(param, df, last_day)
+    return df
+
+def fetch_with_retry(param: Dict, tag: str):
+    attempts = QUERY_RETRIES + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            return call_with_timeout(lambda: getData(param=param), QUERY_TIMEOUT_SEC)
+        except MissingColumnError as e:
+            raise SchemaError(f"{tag} {e}") from e
+        except Exception as e:
+            if attempt == attempts:
+                raise QueryError(f"{tag} 조회 실패({attempts}회 시도): {e}") from e
+            wait = RETRY_BACKOFF_SEC * (2 ** (attempt - 1)) * (1 + random.random() * 0.2)
+            log(f"{tag} 조회 실패({attempt}/{attempts}): {e} → {wait:.1f}s 후 재시도")
+            time.sleep(wait)
+
+# 집계 pushdown: 원본 행 대신 (일자 × 대분류 × 설비)당 1행만 전송 (mtbi_source 참고)
+# 설비 컬럼(EQUIP_COL/CLASS_COL)이 없는 테이블이면 *_PLANT (일자당 1행, 전체 합계만)로 다시 조회
+WORK_PUSHDOWN_PLANT = {
+    "group_by": ["work_date"],
+    "aggregates": {"work": {"fn": "sum", "column": "use_time"}},
+}
+ERROR_PUSHDOWN_PLANT = {
+    # day = start_time + 2시간의 날짜, edge = 정확히 22:00:00 (앞/뒤 두 날 모두에 포함)
+    "derived": {
+        "day": {"fn": "shift_date", "column": "start_time", "hours": 2},
+        "edge": {"fn": "time_is", "column": "start_time", "value": "22:00:00"},
+    },
+    "group_by": ["day", "edge"],
+    "aggregates": {"err": {"fn": "count"}},
+}
+WORK_PUSHDOWN = dict(WORK_PUSHDOWN_PLANT, group_by=["work_date", CLASS_COL, EQUIP_COL])
+ERROR_PUSHDOWN = dict(ERROR_PUSHDOWN_PLANT, group_by=["day", "edge", CLASS_COL, EQUIP_COL])
+
+def fetch_work_day(target_date: date, by_equipment: bool = True) -> pd.DataFrame:
     """
-    target_date의 전체 설비 가동시간 합계
+    target_date의 설비별 가동시간 합계 (work_date, large_class, eqp_id, work)
     - dateFrom/dateTo = YYYY-MM-DD
     - ✅ work_date = YYMMDD(예: 2025-11-14 → '251114') 조건 추가
     """
@@ -95,25 +240,14 @@ def get_work_time(target_date: date) -> int:
         "dateFrom": ds,
         "dateTo": ds,
         "work_date": work_date_str,  # ← 추가된 조건
+        **(WORK_PUSHDOWN if by_equipment else WORK_PUSHDOWN_PLANT),
     }
-    log(f"[WORK] {ds} 조회 시작: {param}")
-    try:
-        df = getData(param=param)
-        if df is None or df.empty:
-            log(f"[WORK] {ds} 결과 없음 → 0")
-            return 0
-        if "use_time" not in df.columns:
-            log_error(f"[WORK] {ds} 'use_time' 컬럼 없음 → 0")
-            return 0
-        total = int(df["use_time"].astype(int).sum())
-        log(f"[WORK] {ds} 합계={total}")
-        return total
-    except Exception as e:
-        log_error(f"[WORK] {ds} 조회 예외 → 0", e)
-        return 0
+    log(f"[WORK] {ds} 조회 시작: work_date={work_date_str}")
+    df = query(param, f"[WORK] {ds}", target_date)
+    return df if df is not None else pd.DataFrame()
 
-def get_error_count(target_date: date) -> int:
-    """target_date 기준 에러 건수(전일 22:00 ~ 당일 22:00, 숫자 시작 코드만)"""
+def fetch_error_day(target_date: date, by_equipment: bool = True) -> pd.DataFrame:
+    """target_date 기준 설비별 에러 건수(전일 22:00 ~ 당일 22:00, 숫자 시작 코드만)"""
     start_dt = (target_date - timedelta(days=1)).strftime("%Y-%m-%d") + " 22:00:00"
     end_dt   = target_date.strftime("%Y-%m-%d") + " 22:00:00"
     param = {
@@ -122,202 +256,399 @@ def get_error_count(target_date: date) -> int:
         "compare_conditions": [
             f"start_time >= '{start_dt}'",
             f"start_time <= '{end_dt}'",
-            "error_code >= '0'",
-            "error_code < 'A'",
-            "error_code != ' '"
-        ]
+        ] + ERROR_CODE_CONDITIONS,
+        **(ERROR_PUSHDOWN if by_equipment else ERROR_PUSHDOWN_PLANT),
     }
     log(f"[ERR ] {yyyymmdd(target_date)} 조회: {start_dt} ~ {end_dt} + 숫자코드 조건")
-    try:
-        df = getData(param=param)
-        cnt = 0 if (df is None or df.empty) else int(len(df))
-        log(f"[ERR ] {yyyymmdd(target_date)} 건수={cnt}")
-        return cnt
-    except Exception as e:
-        log_error(f"[ERR ] {yyyymmdd(target_date)} 조회 예외 → 0", e)
-        return 0
+    df = query(param, f"[ERR ] {yyyymmdd(target_date)}", target_date)
+    return df if df is not None else pd.DataFrame()
 
-# ====================== MTBI 계산/집계 ======================
+# ====================== Impala 기간 일괄 조회(bulk) ======================
+
+def fetch_work_range(start: date, end: date, refresh: bool = False,
+                     by_equipment: bool = True) -> pd.DataFrame:
+    """start~end 설비별 일 가동시간 합계 (work_date YYMMDD 범위 조건, 1회 조회)"""
+    param = {
+        "table_name": TABLE_RUNTIME,
+        "large_class": LARGE_CLASS,
+        "dateFrom": yyyymmdd(start),
+        "dateTo": yyyymmdd(end),
+        "compare_conditions": [
+            f"work_date >= '{start.strftime('%y%m%d')}'",
+            f"work_date <= '{end.strftime('%y%m%d')}'",
+        ],
+        **(WORK_PUSHDOWN if by_equipment else WORK_PUSHDOWN_PLANT),
+    }
+    log(f"[BULK] 가동시간 조회: {yyyymmdd(start)} ~ {yyyymmdd(end)}")
+    df = query(param, "[BULK] 가동시간", end, refresh)
+    return df if df is not None else pd.DataFrame()
+
+def fetch_error_range(start: date, end: date, refresh: bool = False,
+                      by_equipment: bool = True) -> pd.DataFrame:
+    """start~end 설비별 일 에러 건수 (start 전일 22:00 ~ end 22:00, 숫자 시작 코드만, 1회 조회)"""
+    start_dt = (start - timedelta(days=1)).strftime("%Y-%m-%d") + " 22:00:00"
+    end_dt   = end.strftime("%Y-%m-%d") + " 22:00:00"
+    param = {
+        "table_name": TABLE_ERROR,
+        "large_class": LARGE_CLASS,
+        "compare_conditions": [
+            f"start_time >= '{start_dt}'",
+            f"start_time <= '{end_dt}'",
+        ] + ERROR_CODE_CONDITIONS,
+        **(ERROR_PUSHDOWN if by_equipment else ERROR_PUSHDOWN_PLANT),
+    }
+    log(f"[BULK] 에러 조회: {start_dt} ~ {end_dt} + 숫자코드 조건")
+    df = query(param, "[BULK] 에러", end, refresh)
+    return df if df is not None else pd.DataFrame()
 
-def calc_daily_record(d: date) -> Dict:
+def _truthy(s: pd.Series) -> pd.Series:
+    """bool/0·1/'true' 등 드라이버마다 다른 불리언 표현 → bool"""
+    return s.astype(str).str.strip().str.lower().isin(("true", "1"))
+
+def aggregate_by_equipment(work_df: pd.DataFrame, err_df: pd.DataFrame,
+                           days: List[date], by_equipment: bool = True) -> pd.DataFrame:
     """
-    하루치 MTBI 계산 결과(딕셔너리)
-    저장 형태: {"date": YYYY-MM-DD, "work": int, "err": int, "mtbi": float}
+    집계 조회 결과 -> 일자 × large_class × 설비별 work/err
+    - work_df: work_date(YYMMDD), large_class, eqp_id, work
+    - err_df : day(YYYY-MM-DD), edge, large_class, eqp_id, err
+      (edge=True 는 정확히 22:00:00 → 전날에도 한 번 더 더함)
+    - 반환 컬럼: date(YYYY-MM-DD), large_class, eqp_id, work, err
+    - by_equipment=False: *_PLANT 조회 결과(설비 컬럼 없음) → date, work, err (일자별 전체)
     """
-    work = get_work_time(d)
-    err  = get_error_count(d)
+    keys = [CLASS_COL, EQUIP_COL] if by_equipment else []
+    day_index = pd.DatetimeIndex([pd.Timestamp(d) for d in days])
+    frames = []
+    if not work_df.empty:
+        if not {"work", "work_date", *keys} <= set(work_df.columns):
+            raise SchemaError("가동시간 집계 결과 컬럼 없음")
+        day = pd.to_datetime(work_df["work_date"].astype(str).str.strip(), format="%y%m%d")
+        w = (work_df.assign(day=day, work=pd.to_numeric(work_df["work"]))
+             .groupby(["day", *keys], dropna=False)["work"].sum())
+        frames.append(w)
+    if not err_df.empty:
+        if not {"err", "day", "edge", *keys} <= set(err_df.columns):
+            raise SchemaError("에러 집계 결과 컬럼 없음")
+        day = pd.to_datetime(err_df["day"].astype(str).str[:10])
+        edge = _truthy(err_df["edge"])
+        both = pd.concat([err_df.assign(day=day),
+                          err_df[edge].assign(day=day[edge] - pd.Timedelta(days=1))],
+                         ignore_index=True)
+        e = (both.assign(err=pd.to_numeric(both["err"]))
+             .groupby(["day", *keys], dropna=False)["err"].sum())
+        frames.append(e)
+    if not frames:
+        return pd.DataFrame(columns=["date", *keys, "work", "err"])
+
+    out = pd.concat(frames, axis=1).fillna(0).reset_index()
+    for col in ("work", "err"):
+        if col not in out.columns:
+            out[col] = 0
+    out = out[out["day"].isin(day_index)]
+    cols = {"date": out["day"].dt.strftime("%Y-%m-%d")}
+    for k in keys:
+        cols[k] = out[k].fillna("").astype(str)
+    cols.update(work=out["work"].astype(int), err=out["err"].astype(int))
+    return pd.DataFrame(cols).reset_index(drop=True)
+
+def records_from_equipment(eqp: pd.DataFrame, days: List[date]) -> List[Dict]:
+    """설비별 일 집계 -> 일자별 전체 MTBI 레코드"""
+    totals = eqp.groupby("date")[["work", "err"]].sum()
+    records = []
+    for d in days:
+        ds = yyyymmdd(d)
+        w, e = (totals.loc[ds, "work"], totals.loc[ds, "err"]) if ds in totals.index else (0, 0)
+        records.append(make_daily_record(d, int(w), int(e)))
+    return records
+
+# ====================== MTBI 계산/집계 ======================
+
+def make_daily_record(d: date, work: int, err: int) -> Dict:
+    """저장 형태: {"date": YYYY-MM-DD, "work": int, "err": int, "mtbi": float}"""
     mtbi = round(work / err, 2) if err > 0 else 0.0
     log(f"[DAILY] {d} MTBI={mtbi} (work={work}, err={err})")
     return {"date": yyyymmdd(d), "work": int(work), "err": int(err), "mtbi": float(mtbi)}
 
-def _safe_num(x) -> Optional[float]:
+def with_plant_fallback(run, tag: str):
+    """
+    run(by_equipment) -> (daily, eqp)
+    - 설비 컬럼이 없는 테이블(SchemaError)이면 전체 합계 조회로 한 번 더 실행
+      → eqp=None (설비별 집계 없음: 저장 시 기존 설비 행 유지), 공장 전체 MTBI는 그대로 저장
+    - 그 밖의 조회 실패(재시도 소진 등)는 그대로 QueryError → 해당 날짜는 누락
+    """
     try:
-        return float(x)
-    except Exception:
-        return None
+        return run(True)
+    except SchemaError as e:
+        log(f"[EQP ] {tag} 설비별 집계 불가 → 전체 합계만 계산 "
+            f"(EQUIP_COL={EQUIP_COL}, CLASS_COL={CLASS_COL} 확인): {e}")
+    daily, _ = run(False)
+    return daily, None
+
+def equipment_rows(eqp: Optional[pd.DataFrame]) -> Optional[List[Dict]]:
+    """upsert_days(equipment=...) 인자 — 설비별 집계가 없으면 None (기존 설비 행을 지우지 않음)"""
+    return None if eqp is None else eqp.to_dict("records")
+
+def calc_daily_detail(d: date):
+    """하루치 (MTBI 레코드, 설비별 집계) — 하루 2회 집계 조회"""
+    def run(by_eqp):
+        eqp = aggregate_by_equipment(fetch_work_day(d, by_eqp), fetch_error_day(d, by_eqp), [d], by_eqp)
+        return records_from_equipment(eqp, [d])[0], eqp
+    return with_plant_fallback(run, str(d))
+
+def calc_daily_records_bulk(start: date, end: date, refresh: bool = False):
+    """start~end (MTBI 레코드, 설비별 집계) — 테이블별 1회 집계 조회 후 일자별 정리"""
+    days = list(daterange(start, end))
+    t0 = time.perf_counter()
+    def run(by_eqp):
+        eqp = aggregate_by_equipment(fetch_work_range(start, end, refresh, by_eqp),
+                                     fetch_error_range(start, end, refresh, by_eqp), days, by_eqp)
+        return records_from_equipment(eqp, days), eqp
+    daily, eqp = with_plant_fallback(run, f"{start} ~ {end}")
+    log(f"[BULK] {start} ~ {end} ({len(days)}일) 조회/집계 {time.perf_counter() - t0:.1f}s")
+    return daily, eqp
+
+def open_store() -> MtbiStore:
+    """MTBI 저장소 열기 — 비어 있고 기존 mtbi.json이 있으면 1회 가져오기"""
+    store = MtbiStore(MTBI_DB_PATH)
+    if store.is_empty() and os.path.isfile(MTBI_JSON_PATH):
+        try:
+            n = store.import_json(MTBI_JSON_PATH)
+            log(f"[STORE] 기존 {MTBI_JSON_PATH} → {MTBI_DB_PATH} 가져오기 {n}건")
+        except Exception as e:
+            log_error(f"[STORE] {MTBI_JSON_PATH} 가져오기 실패", e)
+    elif not store.is_empty() and not store.has_trends():
+        log(f"[STORE] 추세(이동 MTBI/밴드/증감) 최초 계산 {store.rebuild_trends()}건")
+    return store
+
+def publish(store: MtbiStore):
+    """저장 완료 로그 + (옵션) mtbi.json 원자적 내보내기"""
+    if EXPORT_JSON:
+        data = store.export_json(MTBI_JSON_PATH)
+        log(f"[OK] 저장 완료 → {MTBI_DB_PATH}, 내보내기 → {MTBI_JSON_PATH} "
+            f"(daily={len(data['daily'])}, weekly={len(data['weekly'])}, monthly={len(data['monthly'])})")
+    else:
+        log(f"[OK] 저장 완료 → {MTBI_DB_PATH} (version={store.version()})")
+
+# ====================== 실행 잠금 ======================
+
+class LockBusy(Exception):
+    """다른 배치 프로세스가 실행 중"""
+
+def _try_lock(f) -> bool:
+    """열린 잠금 파일에 OS 배타 잠금 (기다리지 않음), 다른 프로세스가 잡고 있으면 False"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _read_lock(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:   # Windows: 잠긴 구간은 다른 프로세스가 읽을 수 없음
+        return ""
 
-def build_weekly_from_daily(daily: List[Dict]) -> List[Dict]:
+@contextmanager
+def batch_lock(path: str = None):
     """
-    daily -> weekly(ISO 주차) 집계
-    - 주의 work 합 / err 합 으로 MTBI 계산 (err 합이 0이면 0.0)
-    - 결과 항목: {"label": "YYYY-Www", "work": int, "err": int, "mtbi": float}
+    배치 실행 잠금 (잠금 파일에 OS 파일 잠금: fcntl.flock / Windows msvcrt.locking)
+    - 잠금은 파일을 연 프로세스가 끝나면(비정상 종료 포함) OS가 해제 → stale 판단이 필요 없고,
+      실행 중인 배치의 잠금은 얼마나 오래 걸려도 빼앗기지 않는다
+    - 이미 잡혀 있으면 LockBusy (같은 프로세스 안에서 다시 잡아도 LockBusy)
+    - 내용(PID 시작시각)은 확인용, 파일은 지우지 않음 (지우면 다른 프로세스가 새 파일을 잠가 둘이 동시에 실행될 수 있음)
+    - 겹쳐 실행돼도 저장소를 동시에 갱신하지 않도록 init/update/catch-up을 감싼다
     """
-    from collections import defaultdict
-    agg = defaultdict(lambda: {"work": 0.0, "err": 0.0})
-    for r in daily:
+    path = path or LOCK_PATH
+    f = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+", encoding="utf-8")
+    try:
+        if not _try_lock(f):
+            raise LockBusy(f"실행 중인 배치 있음 (잠금={path}, 내용={_read_lock(path)!r})")
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()} {time.time():.0f}")
+        f.flush()
         try:
-            d = parse_ymd(r["date"])
-        except Exception:
-            continue
-        w = _safe_num(r.get("work"))
-        e = _safe_num(r.get("err"))
-        if w is None or e is None:
-            # (하위호환) 과거 daily에 work/err가 없으면 해당 일은 집계 제외
-            continue
-        iso_year, iso_week, _ = d.isocalendar()
-        key = f"{iso_year}-W{iso_week:02d}"
-        agg[key]["work"] += w
-        agg[key]["err"]  += e
-
-    weekly = []
-    for key in sorted(agg.keys()):
-        wsum = int(round(agg[key]["work"]))
-        esum = int(round(agg[key]["err"]))
-        mtbi = round(wsum / esum, 2) if esum > 0 else 0.0
-        weekly.append({"label": key, "work": wsum, "err": esum, "mtbi": mtbi})
-    return weekly
-
-def build_monthly_from_daily(daily: List[Dict]) -> List[Dict]:
+            yield
+        finally:
+            _unlock(f)
+    finally:
+        f.close()
+
+# ====================== 누락 점검/보충(catch-up) ======================
+
+def find_gaps(store: MtbiStore, start: date, end: date, verified=()) -> List[date]:
     """
-    daily -> monthly(YYYY-MM) 집계
-    - 월의 work 합 / err 합 으로 MTBI 계산 (err 합이 0이면 0.0)
-    - 결과 항목: {"label": "YYYY-MM", "work": int, "err": int, "mtbi": float}
+    start~end 중 다시 계산해야 할 날짜
+    - 저장되지 않은 날 (조회 실패/서버 중단)
+    - work=0 또는 err=0인 의심 날짜 (예전 방식에서 실패를 0으로 저장했을 수 있음)
+    - verified: 이미 재조회로 확인한 날짜는 제외 (실제로 에러 0건인 날 반복 조회 방지)
     """
-    from collections import defaultdict
-    agg = defaultdict(lambda: {"work": 0.0, "err": 0.0})
-    for r in daily:
-        ym = (r.get("date") or "")[:7]
-        if len(ym) != 7:
-            continue
-        w = _safe_num(r.get("work"))
-        e = _safe_num(r.get("err"))
-        if w is None or e is None:
+    saved = store.daily_between(yyyymmdd(start), yyyymmdd(end))
+    gaps = []
+    for d in daterange(start, end):
+        row = saved.get(yyyymmdd(d))
+        if d in verified:
             continue
-        agg[ym]["work"] += w
-        agg[ym]["err"]  += e
-
-    monthly = []
-    for key in sorted(agg.keys()):
-        wsum = int(round(agg[key]["work"]))
-        esum = int(round(agg[key]["err"]))
-        mtbi = round(wsum / esum, 2) if esum > 0 else 0.0
-        monthly.append({"label": key, "work": wsum, "err": esum, "mtbi": mtbi})
-    return monthly
-
-def clip_daily_to_d2(daily: List[Dict], today: date) -> List[Dict]:
+        if row is None or not row[0] or not row[1]:
+            gaps.append(d)
+    return gaps
+
+def catch_up(lookback: int = GAP_LOOKBACK_DAYS, verified: Optional[set] = None) -> List[date]:
     """
-    daily 리스트에서 날짜가 D-1(어제) 또는 오늘인 항목은 제거하고
-    D-2 이하만 남긴다. (work/err/mtbi 필드 유지)
+    최근 lookback일(끝=D-2)의 누락/의심 날짜를 찾아 한 번의 기간 조회로 보충
+    - 저장소 첫 날짜 이전은 대상 아님 (과거 확장은 --init-days)
+    - 캐시는 읽지 않고 다시 조회 (refresh), 대상 날짜만 교체
+    - 반환: 보충한 날짜 목록 (verified에도 추가)
     """
-    max_allowed = two_days_ago(today)  # D-2
-    # 정규화 및 필드 보정
-    normalized = []
-    for r in daily:
-        try:
-            d = parse_ymd(str(r.get("date", "")))
-        except Exception:
-            continue
-        if d <= max_allowed:
-            work = int(_safe_num(r.get("work")) or 0)
-            err  = int(_safe_num(r.get("err")) or 0)
-            mtbi = float(_safe_num(r.get("mtbi")) or (round(work/err, 2) if err > 0 else 0.0))
-            normalized.append({"date": yyyymmdd(d), "work": work, "err": err, "mtbi": mtbi})
-
-    # 날짜 기준 중복 제거(마지막 값 우선) + 정렬
-    by_date = {}
-    for r in normalized:
-        by_date[r["date"]] = r
-    out = list(by_date.values())
-    out.sort(key=lambda x: x["date"])
-    return out
-
-def save_json_from_daily(daily: List[Dict]):
-    weekly  = build_weekly_from_daily(daily)
-    monthly = build_monthly_from_daily(daily)
-    data = {"daily": daily, "weekly": weekly, "monthly": monthly}
-    with open(MTBI_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    log(f"[OK] 저장 완료 → {MTBI_JSON_PATH} "
-        f"(daily={len(daily)}, weekly={len(weekly)}, monthly={len(monthly)})")
-
-def load_daily() -> List[Dict]:
-    if not os.path.isfile(MTBI_JSON_PATH):
+    end = two_days_ago(today_local())
+    start = end - timedelta(days=lookback - 1)
+    store = open_store()
+    first = store.first_date()
+    if first is None:
+        log("[CATCHUP] 저장소가 비어 있음 → --init-days 로 초기 구축 필요")
         return []
+    start = max(start, parse_ymd(first))
+    gaps = find_gaps(store, start, end, verified or ())
+    if not gaps:
+        log(f"[CATCHUP] {start} ~ {end} 누락/의심 날짜 없음")
+        return []
+
+    log(f"[CATCHUP] 대상 {len(gaps)}일: {', '.join(yyyymmdd(d) for d in gaps)}")
+    t0 = time.perf_counter()
     try:
-        with open(MTBI_JSON_PATH, "r", encoding="utf-8") as f:
-            j = json.load(f)
-        # 가능한 한 필드 보존(하위호환: work/err 누락 가능)
-        out = []
-        for r in (j.get("daily", []) or []):
-            out.append({
-                "date": str(r.get("date", "")),
-                "work": r.get("work"),
-                "err":  r.get("err"),
-                "mtbi": r.get("mtbi"),
-            })
-        return out
-    except Exception:
+        daily, eqp = calc_daily_records_bulk(gaps[0], gaps[-1], refresh=True)
+    except QueryError as e:
+        log_error("[CATCHUP] 조회 실패 → 다음 점검에서 재시도", e)
         return []
+    wanted = {yyyymmdd(d) for d in gaps}
+    daily = [r for r in daily if r["date"] in wanted]
+    if eqp is not None and not eqp.empty:
+        eqp = eqp[eqp["date"].isin(wanted)]
+    store.upsert_days(daily, equipment_rows(eqp))
+    publish(store)
+    if verified is not None:
+        verified.update(gaps)
+
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    span = (gaps[-1] - gaps[0]).days + 1
+    log(f"[CATCHUP] {len(gaps)}일 보충 완료 (조회 범위 {span}일) · {elapsed:.1f}s · "
+        f"{len(gaps) / elapsed:.2f}일/s")
+    return gaps
 
 # ====================== 동작 모드 ======================
 
-def init_days(n: int):
+def calc_daily_records_each(start: date, end: date, workers: int = 1):
+    """
+    start~end MTBI — 하루씩 조회(하루 2회), workers일 동시 실행
+    - 반환: (날짜순 daily 목록, 설비별 일 집계, 실패한 날짜 목록)
+      설비별 집계를 못 한 날이 하나라도 있으면 설비별 집계는 None (기존 설비 행 유지)
+    """
+    days = list(daterange(start, end))
+    total = len(days)
+    by_date, eqp_frames, missing = {}, [], []
+    plant_only = False
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mtbi-day") as pool:
+        futures = {pool.submit(calc_daily_detail, d): d for d in days}
+        for i, fut in enumerate(as_completed(futures), 1):
+            d = futures[fut]
+            try:
+                by_date[d], eqp = fut.result()
+                if eqp is None:
+                    plant_only = True
+                else:
+                    eqp_frames.append(eqp)
+            except Exception as e:
+                missing.append(d)
+                log_error(f"[INIT] {d} 조회 실패 → 누락 처리", e)
+            elapsed = time.perf_counter() - t0
+            log(f"[INIT] ({i}/{total}) {d} 완료 · 경과 {elapsed:.1f}s · {i / elapsed:.2f}일/s")
+    if plant_only:
+        eqp = None
+    else:
+        eqp = pd.concat(eqp_frames, ignore_index=True) if eqp_frames else pd.DataFrame()
+    return [by_date[d] for d in days if d in by_date], eqp, sorted(missing)
+
+def init_days(n: int, mode: str = "bulk", workers: int = QUERY_WORKERS):
     """
     초기 구축: 과거 n일치 생성
     - 종료일 = D-2 (오늘/어제 제외)
+    - mode: "bulk"(기간 1회 조회) | "daily"(하루씩 조회, workers일 동시)
+    - 조회 실패한 날은 저장하지 않음(누락) → 다음 실행에서 다시 채울 수 있음
     """
     today = today_local()
     end = two_days_ago(today)             # D-2
     start = end - timedelta(days=n - 1)
-    log(f"[INIT] 기간: {start} ~ {end} ({n}일, 오늘·어제 제외)")
+    log(f"[INIT] 기간: {start} ~ {end} ({n}일, 오늘·어제 제외, mode={mode}, workers={workers})")
 
-    daily = []
-    total = (end - start).days + 1
-    i = 0
-    for d in daterange(start, end):
-        i += 1
-        log(f"[INIT] ({i}/{total}) {d} 계산")
-        daily.append(calc_daily_record(d))
-
-    # 안전 클립(D-2 이하만)
-    daily = clip_daily_to_d2(daily, today)
-    save_json_from_daily(daily)
+    missing = []
+    if mode == "bulk":
+        try:
+            daily, eqp = calc_daily_records_bulk(start, end)
+        except Exception as e:
+            log_error("[INIT] bulk 조회/집계 실패 → 일 단위 조회로 전환", e)
+            daily, eqp, missing = calc_daily_records_each(start, end, workers)
+    else:
+        daily, eqp, missing = calc_daily_records_each(start, end, workers)
+    if missing:
+        log_error(f"[INIT] 누락 {len(missing)}일: {', '.join(yyyymmdd(d) for d in missing)}")
+
+    # 기간 반영(설비별 포함) + 안전 클립(D-2 이하만)
+    store = open_store()
+    store.upsert_days(daily, equipment_rows(eqp))
+    store.delete_after(yyyymmdd(end))
+    publish(store)
 
 def update_d2_only():
     """
     운영: **D-2 하루치만** 계산/반영 (누적 저장)
-    - 기존 JSON에서 오늘/어제(D-1) 제거
-    - D-2 레코드만 교체/추가
+    - 저장소에서 오늘/어제(D-1) 제거
+    - D-2 레코드(설비별 집계 포함)만 교체/추가, 해당 주·월 합계만 증감
+    - 조회 실패 시 저장하지 않음 → 누락으로 남아 catch_up이 다시 채움
     """
     today = today_local()
     target = two_days_ago(today)          # D-2
     log(f"[UPDATE] 대상: {target} (오늘·어제 제외, D-2만 갱신)")
 
-    # 새로 계산한 D-2 레코드
-    rec = calc_daily_record(target)
-
-    # 기존 daily 불러와서, 오늘/어제 제거 + D-2 교체/추가
-    daily = load_daily()
-    daily = clip_daily_to_d2(daily, today)        # D-2 이하만 유지
-    daily = [r for r in daily if r["date"] != rec["date"]]
-    daily.append(rec)
-    daily.sort(key=lambda x: x["date"])
+    # 새로 계산한 D-2 레코드 (실패 시 기존 데이터 유지)
+    try:
+        rec, eqp = calc_daily_detail(target)
+    except QueryError as e:
+        log_error(f"[UPDATE] {target} 조회 실패 → 저장하지 않음(누락)", e)
+        return
 
-    save_json_from_daily(daily)
+    # 오늘/어제 제거 + D-2 교체/추가 (해당 주·월 합계만 갱신)
+    store = open_store()
+    store.delete_after(yyyymmdd(target))   # D-2 이하만 유지
+    store.upsert_days([rec], equipment_rows(eqp))
+    publish(store)
 
-def run_schedule(hhmm: str):
+def locked_run(name: str, fn, *args):
+    """잠금 안에서 fn 실행 — 다른 배치가 실행 중이면 건너뜀 (반환 False)"""
+    try:
+        with batch_lock():
+            fn(*args)
+        return True
+    except LockBusy as e:
+        log(f"[LOCK] {name} 건너뜀: {e}")
+        return False
+
+def run_schedule(hhmm: str, lookback: int = GAP_LOOKBACK_DAYS):
     """
     --schedule HH:MM : 매일 지정 시각에 update_d2_only 실행(무한 루프)
+    - 시작 시, 매일 실행 후, 대기 중 GAP_CHECK_SEC마다 누락/의심 날짜 보충(catch_up)
+    - 각 실행은 잠금 파일로 보호 (겹치는 수동 실행과 동시에 돌지 않음)
     """
     try:
         hh, mm = map(int, hhmm.split(":"))
@@ -325,7 +656,16 @@ def run_schedule(hhmm: str):
     except Exception:
         raise ValueError("시간 형식은 HH:MM (예: 06:05)")
 
+    verified = set()   # 재조회로 확인된 날짜 (실제 0건인 날 반복 조회 방지)
+
+    def check_gaps():
+        try:
+            locked_run("catch-up", catch_up, lookback, verified)
+        except Exception as e:
+            log_error("[SCHED] catch_up 실행 중 예외", e)
+
     log(f"[SCHED] 매일 {hh:02d}:{mm:02d} 실행 대기 시작 (무한루프)")
+    check_gaps()
     while True:
         now = datetime.now()
         today_run = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
@@ -336,41 +676,101 @@ def run_schedule(hhmm: str):
 
         wait_sec = (next_run - now).total_seconds()
         log(f"[SCHED] 다음 실행: {next_run} (약 {int(wait_sec)}초 후)")
-        # 1분 간격으로 대기
+        # 1분 간격으로 대기, GAP_CHECK_SEC마다 누락 점검
+        since_check = 0.0
         while wait_sec > 0:
             nap = min(60, wait_sec)
             time.sleep(nap)
             wait_sec -= nap
+            since_check += nap
+            if since_check >= GAP_CHECK_SEC and wait_sec > 0:
+                since_check = 0.0
+                check_gaps()
 
         try:
-            update_d2_only()
+            locked_run("update", update_d2_only)
         except Exception as e:
             log_error("[SCHED] update_d2_only 실행 중 예외", e)
+        check_gaps()
         # 이후 다음 루프로 반복
 
 # ====================== 메인 ======================
 
 def main():
+    global QUERY_TIMEOUT_SEC, QUERY_RETRIES, RAW_CACHE, EXPORT_JSON, DATA_SOURCE
     parser = argparse.ArgumentParser(description="MTBI 배치 (D-2까지 저장 · 주/월=합계기반 · work_date조건 포함)")
     g = parser.add_mutually_exclusive_group()
     g.add_argument("--init-days", type=int, help="초기 구축: 과거 N일 생성 (끝= D-2)")
     g.add_argument("--update", action="store_true", help="D-2 하루치 갱신/누적 저장")
     g.add_argument("--schedule", type=str, help="매일 HH:MM에 --update 수행(무한 실행)")
+    g.add_argument("--catch-up", action="store_true", help="최근 누락/의심 날짜 보충 후 종료")
+    parser.add_argument("--mode", choices=["bulk", "daily"], default="bulk",
+                        help="--init-days 조회 방식: bulk(기간 1회 조회, 기본) | daily(하루씩 조회)")
+    parser.add_argument("--workers", type=int, default=QUERY_WORKERS, help="--mode daily 동시 조회 일수")
+    parser.add_argument("--timeout", type=float, default=QUERY_TIMEOUT_SEC, help="getData 1회 제한 시간(초)")
+    parser.add_argument("--retries", type=int, default=QUERY_RETRIES, help="조회 실패 시 재시도 횟수")
+    parser.add_argument("--no-cache", action="store_true", help="확정 데이터 로컬 캐시 사용 안 함")
+    parser.add_argument("--cache-clear", action="store_true", help="로컬 캐시 전체 삭제")
+    parser.add_argument("--cache-invalidate-from", type=str, metavar="YYYY-MM-DD",
+                        help="해당 날짜 이후 데이터를 포함한 캐시 항목 삭제")
+    parser.add_argument("--cache-max-mb", type=int, default=RAW_CACHE_MAX_MB, help="로컬 캐시 최대 용량(MB)")
+    parser.add_argument("--lookback", type=int, default=GAP_LOOKBACK_DAYS,
+                        help="--catch-up/--schedule 누락 점검 범위(일)")
+    parser.add_argument("--json", action="store_true",
+                        help="저장 후 mtbi.json 내보내기 (전체 이력을 다시 씀, 외부 연동용)")
+    parser.add_argument("--no-json", action="store_true", help=argparse.SUPPRESS)  # 예전 옵션 (이제 기본값)
+    parser.add_argument("--source", choices=["impala", "synthetic"], default="impala",
+                        help="데이터 소스: impala(기본) | synthetic(합성 데이터)")
+    parser.add_argument("--synthetic-equipments", type=int, default=50, help="synthetic 설비 수")
+    parser.add_argument("--synthetic-latency-ms", type=float, default=0.0, help="synthetic 조회 1회 지연(ms)")
     args = parser.parse_args()
 
-    log(f"[CONFIG] RUNTIME={TABLE_RUNTIME}, ERROR={TABLE_ERROR}, CLASS={LARGE_CLASS}")
-    log(f"[CONFIG] OUTPUT={MTBI_JSON_PATH}")
+    QUERY_TIMEOUT_SEC = args.timeout
+    QUERY_RETRIES = max(0, args.retries)
+    EXPORT_JSON = args.json and not args.no_json
+    if args.source == "synthetic":
+        DATA_SOURCE = get_source(
+            "synthetic", runtime_table=TABLE_RUNTIME, error_table=TABLE_ERROR,
+            large_class=LARGE_CLASS, equipments=args.synthetic_equipments,
+            latency_ms=args.synthetic_latency_ms,
+        )
+
+    log(f"[CONFIG] SOURCE={DATA_SOURCE.name}, RUNTIME={TABLE_RUNTIME}, ERROR={TABLE_ERROR}, CLASS={LARGE_CLASS}")
+    log(f"[CONFIG] STORE={MTBI_DB_PATH}, JSON={MTBI_JSON_PATH if EXPORT_JSON else '(내보내기 안 함)'}")
+    log(f"[CONFIG] TIMEOUT={QUERY_TIMEOUT_SEC}s, RETRIES={QUERY_RETRIES}")
+
+    if not args.no_cache or args.cache_clear or args.cache_invalidate_from:
+        cache = ResultCache(RAW_CACHE_PATH, args.cache_max_mb * 1024 * 1024)
+        if args.cache_clear:
+            log(f"[CACHE] 전체 삭제: {cache.invalidate()}건")
+        if args.cache_invalidate_from:
+            since = parse_ymd(args.cache_invalidate_from)
+            log(f"[CACHE] {since} 이후 삭제: {cache.invalidate(since=since)}건")
+        if not args.no_cache:
+            RAW_CACHE = cache
+            st = cache.stats()
+            log(f"[CONFIG] CACHE={RAW_CACHE_PATH} ({st['entries']}건, {st['bytes'] / 1e6:.1f}MB)")
+        if (args.cache_clear or args.cache_invalidate_from) and not (
+                args.init_days or args.update or args.schedule or args.catch_up):
+            return
 
     if args.init_days:
-        init_days(args.init_days)
+        if not locked_run("init", init_days, args.init_days, args.mode, args.workers):
+            sys.exit(2)
         return
 
     if args.update:
-        update_d2_only()
+        if not locked_run("update", update_d2_only):
+            sys.exit(2)
+        return
+
+    if args.catch_up:
+        if not locked_run("catch-up", catch_up, max(1, args.lookback)):
+            sys.exit(2)
         return
 
     if args.schedule:
-        run_schedule(args.schedule)
+        run_schedule(args.schedule, max(1, args.lookback))
         return
 
     parser.print_help()
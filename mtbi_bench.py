@@ -0,0 +1,155 @@
+"""
+MTBI 배치 벤치마크 (Impala 없이 합성 데이터 소스로 실행)
+
+- 시나리오별 소요시간(wall), 조회 수(query), 반환 행 수, 최대 메모리(tracemalloc peak) 출력
+  · init-bulk        : --init-days N (기간 1회 조회)
+  · init-daily-wK    : --init-days N --mode daily --workers K
+  · init-bulk-cached : 확정 데이터 로컬 캐시가 채워진 상태에서 --init-days N 재실행
+  · update           : --update (D-2 하루치)
+- 매 시나리오는 임시 폴더의 빈 저장소에서 시작 (실제 data/ 폴더는 건드리지 않음)
+- --save 로 결과 저장, --compare 로 이전 결과 대비 회귀(허용치 초과 시 종료코드 1) 확인
+
+예시:
+  python mtbi_bench.py --days 365 --equipments 200 --latency-ms 20
+  python mtbi_bench.py --days 365 --save bench_base.json
+  python mtbi_bench.py --days 365 --compare bench_base.json --tolerance 0.3
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+import mtbi_batch
+from impala_cache import ResultCache
+from mtbi_source import get_source
+
+
+def configure(workdir: str, args):
+    """mtbi_batch 출력 경로/데이터 소스를 임시 폴더·합성 데이터로 교체"""
+    mtbi_batch.MTBI_DB_PATH = os.path.join(workdir, "mtbi.sqlite3")
+    mtbi_batch.MTBI_JSON_PATH = os.path.join(workdir, "mtbi.json")
+    mtbi_batch.EXPORT_JSON = args.json
+    mtbi_batch.RAW_CACHE = None
+    mtbi_batch.RETRY_BACKOFF_SEC = 0.0
+    mtbi_batch.DATA_SOURCE = get_source(
+        "synthetic",
+        runtime_table=mtbi_batch.TABLE_RUNTIME,
+        error_table=mtbi_batch.TABLE_ERROR,
+        large_class=mtbi_batch.LARGE_CLASS,
+        equipments=args.equipments,
+        latency_ms=args.latency_ms,
+        seed=args.seed,
+    )
+    return mtbi_batch.DATA_SOURCE
+
+
+def measure(name: str, fn, source) -> dict:
+    q0, r0 = source.query_count, source.rows_returned
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "wall_s": round(wall, 3),
+        "queries": source.query_count - q0,
+        "rows": source.rows_returned - r0,
+        "peak_mb": round(peak / 1e6, 2),
+    }
+
+
+def run_scenarios(args) -> list:
+    results = []
+    workers_list = [w for w in args.workers if w > 0]
+
+    def fresh(name, fn, cache=False):
+        with tempfile.TemporaryDirectory(prefix="mtbi_bench_") as workdir:
+            source = configure(workdir, args)
+            if cache:
+                mtbi_batch.RAW_CACHE = ResultCache(os.path.join(workdir, "cache.sqlite3"), 1 << 30)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fn()   # 캐시 채우기
+            results.append(measure(name, fn, source))
+
+    fresh("init-bulk", lambda: mtbi_batch.init_days(args.days, "bulk"))
+    for w in workers_list:
+        fresh(f"init-daily-w{w}", lambda w=w: mtbi_batch.init_days(args.days, "daily", w))
+    fresh("init-bulk-cached", lambda: mtbi_batch.init_days(args.days, "bulk"), cache=True)
+
+    with tempfile.TemporaryDirectory(prefix="mtbi_bench_") as workdir:
+        source = configure(workdir, args)
+        with contextlib.redirect_stdout(io.StringIO()):
+            mtbi_batch.init_days(args.days, "bulk")
+        results.append(measure("update", mtbi_batch.update_d2_only, source))
+    return results
+
+
+def print_table(results: list, baseline: dict):
+    print(f"{'scenario':<20}{'wall(s)':>10}{'queries':>10}{'rows':>12}{'peak(MB)':>10}{'vs base':>10}")
+    for r in results:
+        base = baseline.get(r["name"])
+        delta = f"{(r['wall_s'] / base['wall_s'] - 1) * 100:+.0f}%" if base and base["wall_s"] else "-"
+        print(f"{r['name']:<20}{r['wall_s']:>10.3f}{r['queries']:>10}{r['rows']:>12}"
+              f"{r['peak_mb']:>10.2f}{delta:>10}")
+
+
+def regressions(results: list, baseline: dict, tolerance: float) -> list:
+    """wall/peak이 허용치 이상 늘었거나 조회 수가 늘어난 시나리오"""
+    out = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if not base:
+            continue
+        if r["queries"] > base["queries"]:
+            out.append(f"{r['name']}: queries {base['queries']} → {r['queries']}")
+        for key in ("wall_s", "peak_mb"):
+            if base[key] and r[key] > base[key] * (1 + tolerance):
+                out.append(f"{r['name']}: {key} {base[key]} → {r[key]}")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MTBI 배치 벤치마크 (합성 데이터)")
+    parser.add_argument("--days", type=int, default=120, help="--init-days 일수")
+    parser.add_argument("--equipments", type=int, default=100, help="합성 설비 수")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="조회 1회 지연(ms)")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 8], help="--mode daily 동시 조회 수 목록")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="mtbi.json 내보내기 포함")
+    parser.add_argument("--save", type=str, help="결과 저장 파일(JSON)")
+    parser.add_argument("--compare", type=str, help="이전 결과 파일(JSON)과 비교")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="회귀 허용 비율 (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    print(f"[BENCH] days={args.days}, equipments={args.equipments}, latency={args.latency_ms}ms")
+    results = run_scenarios(args)
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] 저장 → {args.save}")
+
+    bad = regressions(results, baseline, args.tolerance)
+    if bad:
+        for b in bad:
+            print(f"[REGRESSION] {b}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
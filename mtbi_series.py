@@ -0,0 +1,138 @@
+"""
+MTBI 시계열 계산 유틸 (app.py / mtbi_batch.py 공용)
+
+- lttb_indices(): Largest-Triangle-Three-Buckets 다운샘플링
+  긴 daily 시계열을 모양(피크/급락)을 유지한 채 max_points개로 줄인다.
+- daily_trends(): 7/28일 이동 MTBI(구간 work 합 / err 합), 28일 P10~P90 밴드,
+  7일 이동 MTBI 전주 대비 증감 — 누적합/슬라이딩 윈도로 한 번에 계산
+- period_deltas(): 주/월 MTBI 직전 기간 대비 증감
+"""
+
+import warnings
+from datetime import date
+from typing import Dict, List, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MA_WINDOWS = (7, 28)        # 이동 MTBI 구간(일)
+BAND_WINDOW = 28            # 백분위 밴드 구간(일)
+BAND_PCTS = (10, 90)        # 밴드 하한/상한 백분위
+WOW_DAYS = 7                # 전주 대비 = 7일 이동 MTBI의 7일 전 대비 증감
+# 어떤 날의 추세값을 다시 계산할 때 필요한 과거 일수
+TREND_CONTEXT_DAYS = max(max(MA_WINDOWS), BAND_WINDOW, MA_WINDOWS[0] + WOW_DAYS)
+TREND_FIELDS = ("ma7", "ma28", "p10", "p90", "delta")
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], n_out: int) -> np.ndarray:
+    """
+    LTTB로 남길 점의 인덱스(오름차순)를 돌려준다.
+    - 첫/마지막 점은 항상 포함
+    - n_out < 3 이거나 점 개수가 n_out 이하이면 전체 인덱스
+    """
+    xs = np.asarray(x, dtype=float)
+    ys = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(xs)
+    if n_out < 3 or n <= n_out:
+        return np.arange(n)
+
+    # 가운데 n-2개 점을 n_out-2개 버킷으로 분할 (버킷 경계 n_out-1개)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xs[nlo:nhi].mean()
+        avg_y = ys[nlo:nhi].mean()
+        # 직전 선택점 a, 다음 버킷 평균점과 만드는 삼각형 넓이(x2)가 최대인 점
+        area = np.abs(
+            (xs[a] - avg_x) * (ys[lo:hi] - ys[a])
+            - (xs[a] - xs[lo:hi]) * (avg_y - ys[a])
+        )
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def series_x(items: List[Dict], field: str) -> List[float]:
+    """x축 값: 'YYYY-MM-DD'이면 날짜 서수(빠진 날 간격 반영), 아니면 순번"""
+    if field == "date":
+        try:
+            return [date.fromisoformat(str(r[field])).toordinal() for r in items]
+        except (KeyError, ValueError):
+            pass
+    return list(range(len(items)))
+
+
+def downsample(items: List[Dict], max_points: int, field: str = "date") -> List[Dict]:
+    """MTBI 레코드 목록을 max_points개 이하로 줄인다 (원본 레코드를 그대로 선택)"""
+    if max_points < 3 or len(items) <= max_points:
+        return items
+    ys = [r.get("mtbi") if r.get("mtbi") is not None else np.nan for r in items]
+    idx = lttb_indices(series_x(items, field), ys, max_points)
+    return [items[i] for i in idx]
+
+
+def _window_sums(v: np.ndarray, w: int) -> np.ndarray:
+    """각 위치에서 끝나는 길이 w 구간 합 (앞쪽은 있는 만큼)"""
+    c = np.concatenate(([0.0], np.cumsum(v)))
+    i = np.arange(1, len(c))
+    return c[i] - c[np.maximum(0, i - w)]
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.full(len(num), np.nan)
+    ok = den > 0
+    out[ok] = num[ok] / den[ok]
+    return out
+
+
+def _rounded(a: np.ndarray) -> List:
+    return [None if np.isnan(x) else round(float(x), 2) for x in a]
+
+
+def daily_trends(daily: List[Dict]) -> List[Dict]:
+    """
+    daily [{"date","work","err"}] (날짜순) -> [{"date","ma7","ma28","p10","p90","delta"}]
+    - 빠진 날은 work/err 0으로 보고 달력 기준 구간을 쓴다
+    - 이동 MTBI = 구간 work 합 / 구간 err 합 (일 MTBI 평균 아님)
+    - 밴드는 err>0인 날의 일 MTBI 백분위, delta = ma7 - 7일 전 ma7
+    """
+    rows = [r for r in daily if r.get("date")]
+    if not rows:
+        return []
+    ords = np.array([date.fromisoformat(str(r["date"])).toordinal() for r in rows])
+    pos = ords - ords.min()
+    n = int(pos.max()) + 1
+    w = np.array([r.get("work") or 0 for r in rows], dtype=float)
+    e = np.array([r.get("err") or 0 for r in rows], dtype=float)
+    work, err, mtbi = np.zeros(n), np.zeros(n), np.full(n, np.nan)
+    work[pos], err[pos] = w, e
+    mtbi[pos] = _ratio(w, e)
+
+    cols = {f"ma{k}": _ratio(_window_sums(work, k), _window_sums(err, k)) for k in MA_WINDOWS}
+    padded = np.concatenate((np.full(BAND_WINDOW - 1, np.nan), mtbi))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # 구간 전체가 NaN
+        lo, hi = np.nanpercentile(sliding_window_view(padded, BAND_WINDOW), BAND_PCTS, axis=1)
+    cols[f"p{BAND_PCTS[0]}"], cols[f"p{BAND_PCTS[1]}"] = lo, hi
+    ma = cols[f"ma{MA_WINDOWS[0]}"]
+    delta = np.full(n, np.nan)
+    delta[WOW_DAYS:] = ma[WOW_DAYS:] - ma[:-WOW_DAYS]
+    cols["delta"] = delta
+
+    out = {name: _rounded(v[pos]) for name, v in cols.items()}
+    return [dict({"date": str(r["date"])}, **{name: out[name][i] for name in out})
+            for i, r in enumerate(rows)]
+
+
+def period_deltas(items: List[Dict]) -> List[Dict]:
+    """주/월 [{"label","mtbi"}] (라벨순) -> [{"label","delta"}], delta = 직전 기간 대비 MTBI 증감"""
+    m = np.array([r.get("mtbi") if r.get("mtbi") is not None else np.nan for r in items], dtype=float)
+    delta = np.full(len(m), np.nan)
+    delta[1:] = m[1:] - m[:-1]
+    return [{"label": r["label"], "delta": d} for r, d in zip(items, _rounded(delta))]
@@ -0,0 +1,296 @@
+"""
+MTBI 배치 데이터 소스 (getData 교체 가능 인터페이스)
+
+- ImpalaSource   : 실제 환경의 getData(param=...) 호출 (모듈은 처음 조회할 때 import)
+- SyntheticSource: Impala 없이 배치를 실행/측정하기 위한 로컬 합성 데이터
+    · 설비 수/기간/지연시간(latency) 설정 가능, 같은 seed면 같은 데이터
+    · getData의 param(table_name, dateFrom/dateTo, work_date, compare_conditions)을 해석해
+      실제 테이블처럼 필터링된 DataFrame을 돌려준다
+    · 호출 수(query_count)·반환 행 수(rows_returned) 집계 → 벤치마크용
+
+집계/컬럼 pushdown (param 추가 키, 없으면 기존처럼 원본 행):
+  "columns":    ["eqp_id", "use_time"]                       # 컬럼 projection
+  "derived":    {"day":  {"fn": "shift_date", "column": "start_time", "hours": 2},
+                 "edge": {"fn": "time_is", "column": "start_time", "value": "22:00:00"}}
+  "group_by":   ["large_class", "eqp_id", "day", "edge"]
+  "aggregates": {"err": {"fn": "count"}, "work": {"fn": "sum", "column": "use_time"}}
+  → 그룹당 1행만 전송. Impala 커넥터가 지원하면(IMPALA_PUSHDOWN=True) 그대로 전달하고
+    render_impala_select()로 만든 SELECT/GROUP BY 절도 함께 넘긴다.
+    지원하지 않으면 원본 행을 받아 apply_pushdown()으로 로컬에서 같은 결과를 만든다.
+  테이블에 없는 컬럼을 쓰면 어느 경로든 MissingColumnError (재시도해도 같은 결과)
+
+예시:
+  source = get_source("synthetic", equipments=200, latency_ms=50)
+  df = source.get_data({"table_name": TABLE_RUNTIME, "dateFrom": "2025-01-01", ...})
+"""
+
+import re
+import time
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+IMPALA_MODULE = "your_impala_module"  # ← 실제 모듈 경로 (예: common.impala_connector)
+IMPALA_PUSHDOWN = False               # getData가 columns/derived/group_by/aggregates를 지원하면 True
+
+PUSHDOWN_KEYS = ("columns", "derived", "group_by", "aggregates")
+
+_COND_RE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|<|>)\s*'([^']*)'\s*$")
+# Impala가 없는 컬럼을 만났을 때의 오류 메시지 (AnalysisException)
+_MISSING_COLUMN_RE = re.compile(r"could not resolve (column|field) reference", re.IGNORECASE)
+
+
+# ====================== 집계/컬럼 pushdown ======================
+
+class MissingColumnError(LookupError):
+    """조회/집계에 쓴 컬럼이 테이블에 없음 (재시도해도 결과가 같음)"""
+
+
+def _required_columns(param: Dict) -> set:
+    derived = param.get("derived") or {}
+    cols = {d["column"] for d in derived.values()}
+    cols.update(g for g in param.get("group_by") or [] if g not in derived)
+    cols.update(a["column"] for a in (param.get("aggregates") or {}).values() if "column" in a)
+    if not (param.get("group_by") or param.get("aggregates")):
+        cols.update(param.get("columns") or [])
+    return cols
+
+
+def _derive(df: pd.DataFrame, spec: Dict) -> pd.Series:
+    fn, col = spec["fn"], spec["column"]
+    if fn == "shift_date":
+        # 'YYYY-MM-DD HH:MM:SS' + hours → 'YYYY-MM-DD'
+        shifted = pd.to_datetime(df[col]) + pd.Timedelta(hours=spec.get("hours", 0))
+        return shifted.dt.strftime("%Y-%m-%d")
+    if fn == "time_is":
+        # 시각 부분(문자열)이 value와 같은지 (원본 조건과 같은 문자열 비교)
+        return df[col].astype(str).str[11:] == spec["value"]
+    raise ValueError(f"지원하지 않는 derived 함수: {fn}")
+
+
+def apply_pushdown(df: pd.DataFrame, param: Dict) -> pd.DataFrame:
+    """param의 derived/group_by/aggregates/columns를 DataFrame에 적용 (로컬 실행)"""
+    derived = param.get("derived") or {}
+    group_by = list(param.get("group_by") or [])
+    aggregates = param.get("aggregates") or {}
+    if not (derived or group_by or aggregates or param.get("columns")):
+        return df
+
+    if df.empty:
+        cols = group_by + list(aggregates) if (group_by or aggregates) else list(param.get("columns") or [])
+        return pd.DataFrame(columns=cols)
+    missing = _required_columns(param) - set(df.columns)
+    if missing:
+        raise MissingColumnError(f"컬럼 없음: {', '.join(sorted(missing))}")
+    if derived:
+        df = df.assign(**{name: _derive(df, spec) for name, spec in derived.items()})
+    if group_by or aggregates:
+        sums = {a["column"] for a in aggregates.values() if a["fn"] in ("sum", "min", "max")}
+        if sums:
+            df = df.assign(**{c: pd.to_numeric(df[c]) for c in sums})
+        grouped = df.groupby(group_by, dropna=False, sort=False) if group_by else None
+        parts = []
+        for alias, a in aggregates.items():
+            if a["fn"] == "count":
+                s = grouped.size() if grouped is not None else pd.Series([len(df)])
+            elif a["fn"] in ("sum", "min", "max"):
+                s = getattr(grouped[a["column"]] if grouped is not None else df[a["column"]], a["fn"])()
+                if grouped is None:
+                    s = pd.Series([s])
+            else:
+                raise ValueError(f"지원하지 않는 집계 함수: {a['fn']}")
+            parts.append(s.rename(alias))
+        out = pd.concat(parts, axis=1)
+        return out.reset_index() if group_by else out.reset_index(drop=True)
+    return df[list(param["columns"])]
+
+
+def render_impala_select(param: Dict):
+    """pushdown param -> Impala SQL (SELECT 목록, GROUP BY 목록) 문자열"""
+    derived = param.get("derived") or {}
+    exprs = {}
+    for name, d in derived.items():
+        col = d["column"]
+        if d["fn"] == "shift_date":
+            exprs[name] = f"to_date(hours_add(cast({col} AS timestamp), {int(d.get('hours', 0))}))"
+        elif d["fn"] == "time_is":
+            exprs[name] = f"(substr(cast({col} AS string), 12) = '{d['value']}')"
+        else:
+            raise ValueError(f"지원하지 않는 derived 함수: {d['fn']}")
+    group_by = [exprs.get(g, g) for g in (param.get("group_by") or [])]
+    select = [f"{exprs[g]} AS {g}" if g in exprs else g for g in (param.get("group_by") or [])]
+    for alias, a in (param.get("aggregates") or {}).items():
+        if a["fn"] == "count":
+            select.append(f"COUNT(*) AS {alias}")
+        else:
+            select.append(f"{a['fn'].upper()}(CAST({a['column']} AS BIGINT)) AS {alias}")
+    if not select:
+        select = list(param.get("columns") or ["*"])
+    return ", ".join(select), ", ".join(group_by)
+
+
+# ====================== 데이터 소스 ======================
+
+class DataSource(ABC):
+    """getData(param) 형태의 조회 인터페이스 (pushdown 키 포함 param도 처리)"""
+
+    name = "base"
+
+    @abstractmethod
+    def get_data(self, param: Dict) -> pd.DataFrame:
+        """param -> 조회 결과 DataFrame"""
+
+
+class ImpalaSource(DataSource):
+    name = "impala"
+
+    def __init__(self, module: str = IMPALA_MODULE, pushdown: bool = IMPALA_PUSHDOWN):
+        self.module = module
+        self.pushdown = pushdown
+        self._get_data = None
+
+    def get_data(self, param: Dict) -> pd.DataFrame:
+        if self._get_data is None:
+            self._get_data = importlib.import_module(self.module).getData
+        if not any(param.get(k) for k in PUSHDOWN_KEYS):
+            return self._get_data(param=param)
+        if self.pushdown:
+            select, group_by = render_impala_select(param)
+            try:
+                return self._get_data(param=dict(param, select_expr=select, group_by_expr=group_by))
+            except Exception as e:
+                if _MISSING_COLUMN_RE.search(str(e)):
+                    raise MissingColumnError(str(e)) from e
+                raise
+        # 커넥터가 pushdown 미지원 → 원본 조회 후 로컬 집계 (결과 동일, 전송량 절감 없음)
+        raw = self._get_data(param={k: v for k, v in param.items() if k not in PUSHDOWN_KEYS})
+        return apply_pushdown(raw if raw is not None else pd.DataFrame(), param)
+
+
+class SyntheticSource(DataSource):
+    """
+    합성 가동시간/에러 테이블
+    - 가동시간: 날짜 × 설비 1행 (work_date=YYMMDD, use_time=분)
+    - 에러: 설비별 하루 평균 errors_per_day건, 코드 일부는 문자 시작/공백(필터 대상)
+    """
+
+    name = "synthetic"
+
+    def __init__(self, runtime_table: str, error_table: str, large_class: str = "MMM",
+                 equipments: int = 50, errors_per_day: float = 0.4,
+                 latency_ms: float = 0.0, seed: int = 0):
+        self.runtime_table = runtime_table
+        self.error_table = error_table
+        self.large_class = large_class
+        self.eqp_ids = np.array([f"EQ{i:04d}" for i in range(equipments)])
+        self.errors_per_day = errors_per_day
+        self.latency = latency_ms / 1000.0
+        self.seed = seed
+        self.query_count = 0
+        self.rows_returned = 0
+        self._lock = threading.Lock()
+
+    # ---------------- 날짜별 합성 ----------------
+
+    def _rng(self, d: date, table_no: int):
+        return np.random.default_rng([self.seed, d.toordinal(), table_no])
+
+    def _runtime_day(self, d: date) -> pd.DataFrame:
+        rng = self._rng(d, 1)
+        n = len(self.eqp_ids)
+        return pd.DataFrame({
+            "work_date": d.strftime("%y%m%d"),
+            "large_class": self.large_class,
+            "eqp_id": self.eqp_ids,
+            "use_time": rng.integers(600, 1440, n).astype(str),
+        })
+
+    def _error_day(self, d: date) -> pd.DataFrame:
+        """d일 00:00 ~ 24:00 사이 발생 에러"""
+        rng = self._rng(d, 2)
+        counts = rng.poisson(self.errors_per_day, len(self.eqp_ids))
+        total = int(counts.sum())
+        base = datetime(d.year, d.month, d.day)
+        secs = rng.integers(0, 86400, total)
+        codes = rng.choice(["1001", "2203", "3107", "4410", "A100", " "], total,
+                           p=[0.3, 0.25, 0.2, 0.15, 0.07, 0.03])
+        return pd.DataFrame({
+            "large_class": self.large_class,
+            "eqp_id": np.repeat(self.eqp_ids, counts),
+            "start_time": [(base + timedelta(seconds=int(s))).strftime("%Y-%m-%d %H:%M:%S")
+                           for s in secs],
+            "error_code": codes,
+        })
+
+    # ---------------- param 해석 ----------------
+
+    @staticmethod
+    def _conditions(param: Dict) -> List:
+        out = []
+        for c in param.get("compare_conditions") or []:
+            m = _COND_RE.match(c)
+            if not m:
+                raise ValueError(f"지원하지 않는 조건: {c}")
+            out.append(m.groups())
+        return out
+
+    @staticmethod
+    def _filter(df: pd.DataFrame, conds) -> pd.DataFrame:
+        ops = {">=": "ge", "<=": "le", "!=": "ne", "=": "eq", "<": "lt", ">": "gt"}
+        for col, op, val in conds:
+            if df.empty:
+                break
+            df = df[getattr(df[col].astype(str), ops[op])(val)]
+        return df
+
+    @staticmethod
+    def _bound(conds, col: str, ops) -> List[str]:
+        return [val for c, op, val in conds if c == col and op in ops]
+
+    def _days(self, lo: str, hi: str) -> List[date]:
+        start, end = date.fromisoformat(lo[:10]), date.fromisoformat(hi[:10])
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    def get_data(self, param: Dict) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        table = param.get("table_name")
+        conds = self._conditions(param)
+
+        if table == self.runtime_table:
+            days = self._days(param["dateFrom"], param["dateTo"])
+            df = pd.concat([self._runtime_day(d) for d in days], ignore_index=True)
+            if param.get("work_date"):
+                df = df[df["work_date"] == param["work_date"]]
+        elif table == self.error_table:
+            lo = self._bound(conds, "start_time", (">=", ">"))
+            hi = self._bound(conds, "start_time", ("<=", "<"))
+            if not (lo and hi):
+                raise ValueError("에러 테이블 조회에는 start_time 범위 조건이 필요합니다.")
+            days = self._days(max(lo), min(hi))
+            df = pd.concat([self._error_day(d) for d in days], ignore_index=True)
+        else:
+            raise ValueError(f"알 수 없는 테이블: {table}")
+
+        if param.get("large_class"):
+            df = df[df["large_class"] == param["large_class"]]
+        df = self._filter(df, conds).reset_index(drop=True)
+        df = apply_pushdown(df, param)
+        with self._lock:
+            self.query_count += 1
+            self.rows_returned += len(df)
+        return df
+
+
+def get_source(name: str, **kwargs) -> DataSource:
+    """이름으로 데이터 소스 생성 ("impala" | "synthetic")"""
+    if name == "impala":
+        return ImpalaSource(**kwargs)
+    if name == "synthetic":
+        return SyntheticSource(**kwargs)
+    raise ValueError(f"알 수 없는 데이터 소스: {name}")
@@ -0,0 +1,417 @@
+"""
+MTBI 시계열 저장소 (SQLite, mtbi_batch.py / app.py 공용)
+
+- mtbi_daily / mtbi_weekly / mtbi_monthly 테이블 (날짜·라벨 PK 인덱스)
+- 배치 쓰기는 한 트랜잭션: 하루 교체 시 해당 주·월 합계만 증감 (전체 재집계 없음)
+- WAL 모드라 앱(읽기)은 배치 쓰기 중에도 막히지 않고, 커밋 전 데이터는 보이지 않음
+- mtbi_meta.version: 쓰기마다 1 증가 → 앱 캐시 무효화 키
+- mtbi.json은 선택적 내보내기(임시파일 작성 후 os.replace로 원자적 교체)
+- 설비별 drilldown: mtbi_equipment(설비 사전) + mtbi_equip_daily(일자 서수 × 설비 id)
+  + mtbi_equip_period(주/월 라벨 × 설비 id, 일 단위 교체 시 증감) — 정수 키로 작게 저장
+- mtbi_trend: 이동 MTBI(ma7/ma28)·P10~P90 밴드·증감(delta), 같은 쓰기 트랜잭션에서
+  바뀐 날짜 이후만 다시 계산 (mtbi_series.daily_trends) → load_series 항목에 함께 실림
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mtbi_series import TREND_CONTEXT_DAYS, TREND_FIELDS, daily_trends, period_deltas
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mtbi_daily (
+    date TEXT PRIMARY KEY,
+    work INTEGER,
+    err  INTEGER,
+    mtbi REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mtbi_weekly (
+    label TEXT PRIMARY KEY,
+    days  INTEGER NOT NULL,
+    work  INTEGER NOT NULL,
+    err   INTEGER NOT NULL,
+    mtbi  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mtbi_monthly (
+    label TEXT PRIMARY KEY,
+    days  INTEGER NOT NULL,
+    work  INTEGER NOT NULL,
+    err   INTEGER NOT NULL,
+    mtbi  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mtbi_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO mtbi_meta (key, value) VALUES ('version', '0');
+CREATE TABLE IF NOT EXISTS mtbi_equipment (
+    id          INTEGER PRIMARY KEY,
+    large_class TEXT NOT NULL,
+    eqp_id      TEXT NOT NULL,
+    UNIQUE (large_class, eqp_id)
+);
+CREATE TABLE IF NOT EXISTS mtbi_equip_daily (
+    day   INTEGER NOT NULL,  -- date.toordinal()
+    equip INTEGER NOT NULL,
+    work  INTEGER NOT NULL,
+    err   INTEGER NOT NULL,
+    PRIMARY KEY (day, equip)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mtbi_equip_period (
+    label TEXT NOT NULL,     -- 'YYYY-Www' 또는 'YYYY-MM'
+    equip INTEGER NOT NULL,
+    days  INTEGER NOT NULL,
+    work  INTEGER NOT NULL,
+    err   INTEGER NOT NULL,
+    PRIMARY KEY (label, equip)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mtbi_trend (
+    range TEXT NOT NULL,     -- 'daily' | 'weekly' | 'monthly'
+    label TEXT NOT NULL,     -- 날짜 또는 주/월 라벨
+    ma7   REAL,
+    ma28  REAL,
+    p10   REAL,
+    p90   REAL,
+    delta REAL,              -- daily: ma7 전주 대비, weekly/monthly: 직전 기간 대비
+    PRIMARY KEY (range, label)
+) WITHOUT ROWID;
+"""
+
+EQUIP_RANGES = ("daily", "weekly", "monthly")
+
+def week_label(ds: str) -> str:
+    """'YYYY-MM-DD' -> ISO 주차 'YYYY-Www'"""
+    iso_year, iso_week, _ = date(int(ds[:4]), int(ds[5:7]), int(ds[8:10])).isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+
+def month_label(ds: str) -> str:
+    return ds[:7]
+
+
+def mtbi_of(work: int, err: int) -> float:
+    """MTBI = work / err (err가 0이면 0.0), 소수 2자리"""
+    return round(work / err, 2) if err > 0 else 0.0
+
+
+def _num(x) -> Optional[int]:
+    try:
+        return int(round(float(x)))
+    except (TypeError, ValueError):
+        return None
+
+
+class MtbiStore:
+    def __init__(self, path: str):
+        self.path = path
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self, write: bool = False):
+        """
+        연결 → (write면 BEGIN IMMEDIATE) → 성공 시 commit / 예외 시 rollback → close
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not write:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute(
+                    "UPDATE mtbi_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'"
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    # ---------------- 쓰기 ----------------
+
+    @staticmethod
+    def _apply(conn, ds: str, work: Optional[int], err: Optional[int], sign: int):
+        """하루치 work/err를 해당 주·월 합계에 더하거나(+1) 뺀다(-1)"""
+        if work is None or err is None:
+            return
+        for table, label in (("mtbi_weekly", week_label(ds)), ("mtbi_monthly", month_label(ds))):
+            conn.execute(
+                f"INSERT INTO {table} (label, days, work, err, mtbi) VALUES (?, ?, ?, ?, 0.0) "
+                f"ON CONFLICT(label) DO UPDATE SET days = days + excluded.days, "
+                f"work = work + excluded.work, err = err + excluded.err",
+                (label, sign, sign * work, sign * err),
+            )
+            row = conn.execute(f"SELECT days, work, err FROM {table} WHERE label = ?", (label,)).fetchone()
+            if row["days"] <= 0:
+                conn.execute(f"DELETE FROM {table} WHERE label = ?", (label,))
+            else:
+                conn.execute(f"UPDATE {table} SET mtbi = ? WHERE label = ?",
+                             (mtbi_of(row["work"], row["err"]), label))
+
+    @classmethod
+    def _remove(cls, conn, ds: str):
+        old = conn.execute("SELECT work, err FROM mtbi_daily WHERE date = ?", (ds,)).fetchone()
+        if old is None:
+            return
+        cls._apply(conn, ds, old["work"], old["err"], -1)
+        conn.execute("DELETE FROM mtbi_daily WHERE date = ?", (ds,))
+
+    def upsert_days(self, records: Iterable[Dict], equipment: Optional[Iterable[Dict]] = None) -> int:
+        """
+        daily 레코드 추가/교체 (한 트랜잭션), 반영 건수 반환
+        - equipment: 같은 트랜잭션에서 교체할 설비별 일 집계 (_replace_equipment 참고),
+          주어지면 records 날짜의 기존 설비 행은 (새 행이 없더라도) 모두 지운다
+        """
+        records = list(records)
+        n = 0
+        with self.connect(write=True) as conn:
+            if equipment is not None:
+                for r in records:
+                    self._remove_equip_day(conn, date.fromisoformat(str(r["date"])).toordinal())
+                self._replace_equipment(conn, equipment)
+            for r in records:
+                ds = str(r["date"])
+                work, err = _num(r.get("work")), _num(r.get("err"))
+                mtbi = r.get("mtbi")
+                if mtbi is None and work is not None and err is not None:
+                    mtbi = mtbi_of(work, err)
+                self._remove(conn, ds)
+                conn.execute(
+                    "INSERT INTO mtbi_daily (date, work, err, mtbi) VALUES (?, ?, ?, ?)",
+                    (ds, work, err, mtbi),
+                )
+                self._apply(conn, ds, work, err, +1)
+                n += 1
+            if records:
+                self._refresh_trends(conn, min(str(r["date"]) for r in records))
+        return n
+
+    def delete_after(self, max_ds: str) -> int:
+        """max_ds 이후 날짜(오늘/어제 등) 삭제"""
+        with self.connect(write=True) as conn:
+            dates = [r["date"] for r in conn.execute(
+                "SELECT date FROM mtbi_daily WHERE date > ?", (max_ds,))]
+            for ds in dates:
+                self._remove(conn, ds)
+            for (day,) in conn.execute(
+                    "SELECT DISTINCT day FROM mtbi_equip_daily WHERE day > ?",
+                    (date.fromisoformat(max_ds).toordinal(),)).fetchall():
+                self._remove_equip_day(conn, day)
+            if dates:
+                conn.execute("DELETE FROM mtbi_trend WHERE range = 'daily' AND label > ?", (max_ds,))
+                self._refresh_period_trends(conn)
+        return len(dates)
+
+    # ---------------- 추세 ----------------
+
+    @classmethod
+    def _refresh_trends(cls, conn, since: str):
+        """since 이후 daily 추세 재계산 (앞쪽 TREND_CONTEXT_DAYS일은 구간 계산용으로만 읽음)"""
+        lo = (date.fromisoformat(since) - timedelta(days=TREND_CONTEXT_DAYS)).isoformat()
+        daily = [dict(r) for r in conn.execute(
+            "SELECT date, work, err FROM mtbi_daily WHERE date >= ? ORDER BY date", (lo,))]
+        conn.execute("DELETE FROM mtbi_trend WHERE range = 'daily' AND label >= ?", (since,))
+        conn.executemany(
+            "INSERT INTO mtbi_trend (range, label, ma7, ma28, p10, p90, delta) "
+            "VALUES ('daily', ?, ?, ?, ?, ?, ?)",
+            [(t["date"], *(t[f] for f in TREND_FIELDS))
+             for t in daily_trends(daily) if t["date"] >= since],
+        )
+        cls._refresh_period_trends(conn)
+
+    @staticmethod
+    def _refresh_period_trends(conn):
+        """주/월 직전 기간 대비 증감 (행 수가 적어 전체 재계산)"""
+        for range_name, table in (("weekly", "mtbi_weekly"), ("monthly", "mtbi_monthly")):
+            items = [dict(r) for r in conn.execute(f"SELECT label, mtbi FROM {table} ORDER BY label")]
+            conn.execute("DELETE FROM mtbi_trend WHERE range = ?", (range_name,))
+            conn.executemany(
+                "INSERT INTO mtbi_trend (range, label, delta) VALUES (?, ?, ?)",
+                [(range_name, d["label"], d["delta"]) for d in period_deltas(items)],
+            )
+
+    def rebuild_trends(self) -> int:
+        """저장된 전체 기간 추세 재계산 (기존 저장소에 처음 적용할 때)"""
+        with self.connect(write=True) as conn:
+            first = conn.execute("SELECT MIN(date) FROM mtbi_daily").fetchone()[0]
+            conn.execute("DELETE FROM mtbi_trend")
+            if first:
+                self._refresh_trends(conn, first)
+            return conn.execute("SELECT COUNT(*) FROM mtbi_trend").fetchone()[0]
+
+    # ---------------- 설비별 쓰기 ----------------
+
+    @staticmethod
+    def _equip_ids(conn, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        keys = set(keys)
+        conn.executemany(
+            "INSERT OR IGNORE INTO mtbi_equipment (large_class, eqp_id) VALUES (?, ?)", keys)
+        return {(r["large_class"], r["eqp_id"]): r["id"] for r in conn.execute(
+            "SELECT id, large_class, eqp_id FROM mtbi_equipment")}
+
+    @staticmethod
+    def _apply_equip_day(conn, day: int, sign: int):
+        """mtbi_equip_daily의 하루치 행 전체를 해당 주·월 합계에 더하거나 뺀다"""
+        ds = date.fromordinal(day).isoformat()
+        for label in (week_label(ds), month_label(ds)):
+            conn.execute(
+                "INSERT INTO mtbi_equip_period (label, equip, days, work, err) "
+                "SELECT ?, equip, ?, ? * work, ? * err FROM mtbi_equip_daily WHERE day = ? "
+                "ON CONFLICT(label, equip) DO UPDATE SET days = days + excluded.days, "
+                "work = work + excluded.work, err = err + excluded.err",
+                (label, sign, sign, sign, day),
+            )
+            conn.execute("DELETE FROM mtbi_equip_period WHERE label = ? AND days <= 0", (label,))
+
+    @classmethod
+    def _remove_equip_day(cls, conn, day: int):
+        cls._apply_equip_day(conn, day, -1)
+        conn.execute("DELETE FROM mtbi_equip_daily WHERE day = ?", (day,))
+
+    @classmethod
+    def _replace_equipment(cls, conn, rows: Iterable[Dict]) -> int:
+        """
+        설비별 일 집계 교체 (upsert_days 트랜잭션 안에서)
+        - rows: {"date", "large_class", "eqp_id", "work", "err"}
+        - 포함된 날짜는 기존 설비 행을 모두 지우고 새 행으로 교체, 주/월 합계도 증감
+        """
+        by_day: Dict[int, List[Dict]] = {}
+        for r in rows:
+            by_day.setdefault(date.fromisoformat(str(r["date"])).toordinal(), []).append(r)
+        if not by_day:
+            return 0
+        ids = cls._equip_ids(conn, ((str(r["large_class"]), str(r["eqp_id"]))
+                                    for day_rows in by_day.values() for r in day_rows))
+        n = 0
+        for day, day_rows in by_day.items():
+            cls._remove_equip_day(conn, day)
+            conn.executemany(
+                "INSERT INTO mtbi_equip_daily (day, equip, work, err) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(day, equip) DO UPDATE SET "
+                "work = work + excluded.work, err = err + excluded.err",
+                [(day, ids[(str(r["large_class"]), str(r["eqp_id"]))], int(r["work"]), int(r["err"]))
+                 for r in day_rows],
+            )
+            cls._apply_equip_day(conn, day, +1)
+            n += len(day_rows)
+        return n
+
+    # ---------------- 읽기 ----------------
+
+    def version(self) -> int:
+        with self.connect() as conn:
+            return int(conn.execute(
+                "SELECT value FROM mtbi_meta WHERE key = 'version'").fetchone()[0])
+
+    def is_empty(self) -> bool:
+        with self.connect() as conn:
+            return conn.execute("SELECT 1 FROM mtbi_daily LIMIT 1").fetchone() is None
+
+    def daily_between(self, lo: str, hi: str) -> Dict[str, Tuple[int, int]]:
+        """lo~hi(YYYY-MM-DD, 포함) 저장된 일자 -> (work, err)"""
+        with self.connect() as conn:
+            return {r["date"]: (r["work"], r["err"]) for r in conn.execute(
+                "SELECT date, work, err FROM mtbi_daily WHERE date BETWEEN ? AND ?", (lo, hi))}
+
+    def first_date(self) -> Optional[str]:
+        with self.connect() as conn:
+            return conn.execute("SELECT MIN(date) FROM mtbi_daily").fetchone()[0]
+
+    def has_trends(self) -> bool:
+        with self.connect() as conn:
+            return conn.execute("SELECT 1 FROM mtbi_trend LIMIT 1").fetchone() is not None
+
+    def load_series(self) -> Dict[str, List[Dict]]:
+        """
+        {"daily": [...], "weekly": [...], "monthly": [...]} (한 읽기 트랜잭션, 일관된 스냅샷)
+        - daily 항목: date, work, err, mtbi + ma7, ma28, p10, p90, delta
+        - weekly/monthly 항목: label, work, err, mtbi + delta
+        """
+        with self.connect() as conn:
+            conn.execute("BEGIN")
+            daily = [dict(r) for r in conn.execute(
+                "SELECT d.date, d.work, d.err, d.mtbi, t.ma7, t.ma28, t.p10, t.p90, t.delta "
+                "FROM mtbi_daily d LEFT JOIN mtbi_trend t ON t.range = 'daily' AND t.label = d.date "
+                "ORDER BY d.date")]
+            weekly, monthly = (
+                [dict(r) for r in conn.execute(
+                    f"SELECT p.label, p.work, p.err, p.mtbi, t.delta FROM {table} p "
+                    f"LEFT JOIN mtbi_trend t ON t.range = ? AND t.label = p.label ORDER BY p.label",
+                    (range_name,))]
+                for range_name, table in (("weekly", "mtbi_weekly"), ("monthly", "mtbi_monthly"))
+            )
+            conn.execute("COMMIT")
+        return {"daily": daily, "weekly": weekly, "monthly": monthly}
+
+    def latest_label(self, range_name: str) -> Optional[str]:
+        """설비별 데이터가 있는 가장 최근 날짜/주/월"""
+        with self.connect() as conn:
+            if range_name == "daily":
+                row = conn.execute("SELECT MAX(day) FROM mtbi_equip_daily").fetchone()
+                return date.fromordinal(row[0]).isoformat() if row[0] else None
+            pattern = "____-W__" if range_name == "weekly" else "____-__"
+            row = conn.execute(
+                "SELECT MAX(label) FROM mtbi_equip_period WHERE label LIKE ?", (pattern,)
+            ).fetchone()
+            return row[0]
+
+    def worst_equipment(self, range_name: str, label: str, top: int = 10,
+                        by: str = "equipment") -> List[Dict]:
+        """
+        기간(label) 내 MTBI 최저 설비(또는 large_class) top N
+        - daily: label='YYYY-MM-DD', weekly: 'YYYY-Www', monthly: 'YYYY-MM'
+        - 에러가 없는(err=0) 대상은 순위에서 제외
+        """
+        if range_name == "daily":
+            src, key = "mtbi_equip_daily", "d.day = ?"
+            arg = date.fromisoformat(label).toordinal()
+        else:
+            src, key, arg = "mtbi_equip_period", "d.label = ?", label
+        group = "e.large_class" if by == "large_class" else "e.id"
+        cols = "e.large_class" if by == "large_class" else "e.large_class, e.eqp_id"
+        sql = (
+            f"SELECT {cols}, SUM(d.work) AS work, SUM(d.err) AS err "
+            f"FROM {src} d JOIN mtbi_equipment e ON e.id = d.equip "
+            f"WHERE {key} GROUP BY {group} HAVING SUM(d.err) > 0 "
+            f"ORDER BY CAST(SUM(d.work) AS REAL) / SUM(d.err), SUM(d.err) DESC LIMIT ?"
+        )
+        with self.connect() as conn:
+            rows = [dict(r) for r in conn.execute(sql, (arg, top))]
+        for r in rows:
+            r["mtbi"] = mtbi_of(r["work"], r["err"])
+        return rows
+
+    # ---------------- JSON 가져오기/내보내기 ----------------
+
+    def import_json(self, path: str) -> int:
+        """기존 mtbi.json의 daily를 저장소로 가져온다 (주/월은 daily로 재집계)"""
+        with open(path, "r", encoding="utf-8") as f:
+            j = json.load(f)
+        return self.upsert_days(r for r in (j.get("daily") or []) if r.get("date"))
+
+    def export_json(self, path: str) -> Dict[str, List[Dict]]:
+        """mtbi.json 원자적 내보내기: 같은 폴더 임시파일 작성 → fsync → os.replace"""
+        data = self.load_series()
+        fd, tmp = tempfile.mkstemp(prefix=".mtbi-", suffix=".json", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return data
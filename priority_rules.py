@@ -0,0 +1,161 @@
+"""
+VOC 우선순위 분류 (가중치 키워드 사전 + Aho-Corasick)
+
+- 사전 파일: data/priority_keywords.json
+    {
+      "default": "중",
+      "min_score": 2,
+      "keywords": {"상": {"라인멈춤": 5, "화재": 5, ...},
+                   "중": {"개선": 1, ...},
+                   "하": {"건의": 1, ...}}
+    }
+- 모든 키워드를 오토마톤 하나로 컴파일 → 본문을 한 번만 훑어 등급별 점수 합산
+  (같은 키워드는 여러 번 나와도 한 번만 계산)
+- 가장 점수가 높은 등급(동점이면 상 > 중 > 하), min_score 미만이면 default
+- 공백은 무시하고 영문은 소문자로 비교 ("라인 멈춤" == "라인멈춤", "Downtime" == "downtime")
+- 파일 수정시각이 바뀌면 다시 읽어 컴파일 (get_rules)
+  파일이 깨져 있으면(JSON 문법/알 수 없는 등급 등) 오류를 로그로 남기고 마지막 정상 규칙 유지
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+LEVELS = ("상", "중", "하")  # 동점 시 앞쪽 우선
+
+# 사전 파일이 없을 때 (기존 하드코딩 목록과 같은 결과)
+DEFAULT_CONFIG = {
+    "default": "중",
+    "min_score": 1,
+    "keywords": {
+        "상": {k: 1 for k in ("불량", "라인멈춤", "downtime", "긴급", "고장", "정지", "화재", "안전")},
+    },
+}
+
+
+def normalize(s: str) -> str:
+    return "".join((s or "").split()).lower()
+
+
+class Automaton:
+    """Aho-Corasick: patterns[i]가 나타날 때마다 i를 돌려준다"""
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        for i, p in enumerate(patterns):
+            node = 0
+            for ch in p:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(i)
+
+        # BFS로 실패 링크 연결, 실패 노드의 출력도 합쳐 둔다
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str):
+        """text에 나타난 패턴 번호 (등장할 때마다)"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield from out[node]
+
+
+class PriorityRules:
+    def __init__(self, config: Dict):
+        self.default = config.get("default", "중")
+        if self.default not in LEVELS:
+            raise ValueError(f"default 등급 오류: {self.default}")
+        self.min_score = float(config.get("min_score", 1))
+        weights: Dict[str, List[Tuple[str, float]]] = {}
+        for level, words in (config.get("keywords") or {}).items():
+            if level not in LEVELS:
+                raise ValueError(f"알 수 없는 등급: {level}")
+            for word, weight in words.items():
+                key = normalize(word)
+                if key:
+                    weights.setdefault(key, []).append((level, float(weight)))
+        self.patterns = list(weights)
+        self.weights = [weights[p] for p in self.patterns]
+        self.automaton = Automaton(self.patterns)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """등급별 점수 (매칭된 키워드 가중치 합)"""
+        out = dict.fromkeys(LEVELS, 0.0)
+        for i in set(self.automaton.find(normalize(text))):
+            for level, weight in self.weights[i]:
+                out[level] += weight
+        return out
+
+    def classify(self, text: str) -> str:
+        scores = self.scores(text)
+        best = max(LEVELS, key=lambda lv: (scores[lv], -LEVELS.index(lv)))
+        return best if scores[best] >= self.min_score else self.default
+
+
+def load_rules(path: Optional[str]) -> PriorityRules:
+    if path and os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return PriorityRules(json.load(f))
+    return PriorityRules(DEFAULT_CONFIG)
+
+
+_rules_cache: Tuple = (None, None)  # (파일 키, PriorityRules) — 통째로 교체
+_rules_lock = threading.Lock()
+
+
+def rules_key(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def get_rules(path: str) -> PriorityRules:
+    """
+    사전 파일 (mtime, size)가 같으면 컴파일된 규칙 재사용
+    - 읽기/컴파일 실패 시 마지막 정상 규칙(없으면 DEFAULT_CONFIG)을 그 파일 키로 캐시
+      → 파일이 다시 수정될 때까지 재시도하지 않음
+    """
+    global _rules_cache
+    key = rules_key(path)
+    cached_key, rules = _rules_cache
+    if rules is not None and cached_key == key:
+        return rules
+    with _rules_lock:
+        cached_key, rules = _rules_cache
+        if rules is None or cached_key != key:
+            try:
+                rules = load_rules(path if key else None)
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                log.error("우선순위 사전 %s 읽기 실패 → 이전 규칙 유지: %s", path, e)
+                if rules is None:
+                    rules = PriorityRules(DEFAULT_CONFIG)
+            _rules_cache = (key, rules)
+        return rules
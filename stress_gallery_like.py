@@ -0,0 +1,78 @@
+"""
+행사 사진 좋아요 동시성 스트레스 테스트
+
+- 임시 SQLite DB로 앱을 띄우고, 여러 스레드가 동시에 /api/gallery/like를 호출
+- 즉시 반영(기본)과 write-behind(--flush-ms) 모드 모두 확인 가능
+- 최종 좋아요 수 == 클라이언트 수 × 클릭 수 가 아니면 종료코드 1
+
+예시:
+  python stress_gallery_like.py --clients 16 --clicks 200
+  python stress_gallery_like.py --clients 16 --clicks 200 --flush-ms 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+
+def main():
+    parser = argparse.ArgumentParser(description="좋아요 API 동시성 스트레스 테스트")
+    parser.add_argument("--clients", type=int, default=16, help="동시 클라이언트(스레드) 수")
+    parser.add_argument("--clicks", type=int, default=100, help="클라이언트당 클릭 수")
+    parser.add_argument("--flush-ms", type=int, default=0, help="write-behind 주기(ms), 0이면 즉시 반영")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="like_stress_")
+    os.environ["DEPT_PORTAL_DB_URI"] = "sqlite:///" + os.path.join(tmpdir, "stress.sqlite3")
+    os.environ["GALLERY_LIKE_FLUSH_MS"] = str(args.flush_ms)
+
+    from app import app, ensure_schema, list_event_images, get_likes_map, get_like_aggregator
+
+    with app.app_context():
+        ensure_schema()
+    images = list_event_images()
+    if not images:
+        print("[FAIL] static/gallery/events 폴더에 이미지가 없습니다.")
+        sys.exit(1)
+    img = images[0]["name"]
+
+    errors = []
+    barrier = threading.Barrier(args.clients)
+
+    def client():
+        c = app.test_client()
+        barrier.wait()
+        for _ in range(args.clicks):
+            r = c.post("/api/gallery/like", json={"img": img})
+            if r.status_code != 200 or not r.get_json().get("ok"):
+                errors.append(r.status_code)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    agg = get_like_aggregator()
+    if agg is not None:
+        agg.flush()
+    with app.app_context():
+        got = get_likes_map([img])[img]
+
+    expected = args.clients * args.clicks
+    mode = f"write-behind {args.flush_ms}ms" if args.flush_ms > 0 else "즉시 반영"
+    print(f"[{mode}] {expected}회 클릭 / {elapsed:.2f}s ({expected / elapsed:.0f}회/s), "
+          f"DB 좋아요={got}, 요청 실패={len(errors)}")
+    if errors or got != expected:
+        print(f"[FAIL] 유실된 좋아요 {expected - got}건")
+        sys.exit(1)
+    print("[OK] 유실 없음")
+
+
+if __name__ == "__main__":
+    main()
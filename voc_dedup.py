@@ -0,0 +1,110 @@
+"""
+VOC 유사 중복 탐지 (문자 shingle MinHash + LSH, app.py 공용)
+
+- minhash(): 공백 제거·소문자화한 본문의 문자 2-gram 집합 → NUM_PERM개 최소 해시 (uint32)
+  두 서명이 같은 자리 비율 ≈ shingle 집합 Jaccard 유사도
+  (표본 기준 같은 내용을 다르게 쓴 VOC가 0.26~0.55, 같은 라인·설비를 언급한 다른 내용도
+   0.3~0.4까지 나오므로 유사도만으로는 못 가른다 → 호출부에서 우선순위가 같은 것만 묶음)
+- LshIndex: 서명을 BANDS개 구간(구간당 ROWS개)으로 나눠 구간별 버킷에 등록
+  → 한 구간이라도 같으면 후보. BANDS=64, ROWS=3 기준 후보가 될 확률
+  유사도 0.4: 98%, 0.3: 83%, 0.1: 6%, 0.05: 1% — 후보만 비교하므로 전체 건수와 무관하게 빠르다
+- matches(): 후보 중 추정 유사도 DUP_THRESHOLD 이상을 비슷한 순으로 → 호출부가 조건에 맞는 첫 VOC를 원본으로
+"""
+
+import zlib
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+SHINGLE = 2
+BANDS = 64
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+DUP_THRESHOLD = 0.4   # 추정 Jaccard 이상이면 중복 후보
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)   # 고정 seed: 저장된 서명과 항상 같은 해시 함수
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    s = "".join((text or "").split()).lower()
+    if len(s) < SHINGLE:
+        grams = {s} if s else set()
+    else:
+        grams = {s[i:i + SHINGLE] for i in range(len(s) - SHINGLE + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams),
+                       dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    """본문 -> MinHash 서명 (uint32 NUM_PERM개), 빈 본문은 전부 최댓값"""
+    h = shingle_hashes(text)
+    if h.size == 0:
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint32)
+    # (a*x + b) mod p: a, x < 2^31 이므로 uint64에서 넘치지 않음
+    return ((_A[:, None] * h[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def to_blob(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4").astype(np.uint32)
+
+
+class LshIndex:
+    """
+    메모리 LSH 색인 (voc_id -> 서명)
+    - add(): 1건 추가, max_id로 어디까지 반영했는지 기록 → 호출부가 이후 행만 읽어 증분 반영
+    """
+
+    def __init__(self):
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self._sigs: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.max_id = 0
+
+    @staticmethod
+    def _keys(sig: np.ndarray) -> List[bytes]:
+        return [sig[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+    def __len__(self):
+        return len(self._sigs)
+
+    def add(self, voc_id: int, sig: np.ndarray):
+        with self._lock:
+            if voc_id in self._sigs:
+                return
+            self._sigs[voc_id] = sig
+            for band, key in zip(self._buckets, self._keys(sig)):
+                band.setdefault(key, []).append(voc_id)
+            self.max_id = max(self.max_id, voc_id)
+
+    def add_many(self, rows: Iterable[Tuple[int, np.ndarray]]):
+        for voc_id, sig in rows:
+            self.add(voc_id, sig)
+
+    def candidates(self, sig: np.ndarray) -> set:
+        with self._lock:
+            out = set()
+            for band, key in zip(self._buckets, self._keys(sig)):
+                out.update(band.get(key, ()))
+            return out
+
+    def matches(self, sig: np.ndarray, threshold: float = DUP_THRESHOLD) -> List[Tuple[int, float]]:
+        """추정 유사도 threshold 이상인 [(voc_id, 유사도), ...] 비슷한 순, 동률이면 먼저 등록된 id부터"""
+        out = []
+        for voc_id in self.candidates(sig):
+            sim = similarity(sig, self._sigs[voc_id])
+            if sim >= threshold:
+                out.append((voc_id, sim))
+        out.sort(key=lambda m: (-m[1], m[0]))
+        return out